@@ -0,0 +1,75 @@
+"""store vectors as float32 blobs
+
+Revision ID: vector_blob_storage
+Revises: add_session_id_column
+Create Date: 2024-04-02
+
+"""
+from typing import Sequence, Union
+import json
+
+from alembic import op
+import numpy as np
+import sqlalchemy as sa
+from sqlalchemy.dialects.sqlite import JSON
+
+# revision identifiers, used by Alembic.
+revision: str = 'vector_blob_storage'
+down_revision: str = 'add_session_id_column'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# 每批转换的记录数，避免一次把整张表读入内存
+BATCH_SIZE = 5000
+
+# 需要转换的 (表, 向量列)
+VECTOR_COLUMNS = [
+    ('vector_indices', 'vector'),
+    ('spots', 'vector_embedding'),
+]
+
+def _to_blob(value):
+    if value is None:
+        return None
+    if isinstance(value, (bytes, str)):
+        value = json.loads(value)
+    return np.asarray(value, dtype=np.float32).tobytes()
+
+def _to_json(value):
+    if value is None:
+        return None
+    return json.dumps(np.frombuffer(value, dtype=np.float32).tolist())
+
+def _convert(table: str, source: str, target: str, convert) -> None:
+    """按主键分批读取 source 列，转换后写入 target 列"""
+    bind = op.get_bind()
+    select = sa.text(
+        f"SELECT id, {source} FROM {table} WHERE id > :last_id ORDER BY id LIMIT :limit"
+    )
+    update = sa.text(f"UPDATE {table} SET {target} = :value WHERE id = :id")
+    last_id = 0
+    while True:
+        rows = bind.execute(select, {"last_id": last_id, "limit": BATCH_SIZE}).fetchall()
+        if not rows:
+            break
+        bind.execute(update, [{"id": row[0], "value": convert(row[1])} for row in rows])
+        last_id = rows[-1][0]
+
+def _replace_column(table: str, column: str, new_type, convert) -> None:
+    """新建临时列并分批转换数据，再用临时列替换原列（SQLite 不支持直接修改列类型）"""
+    temp = f'{column}_new'
+    op.add_column(table, sa.Column(temp, new_type, nullable=True))
+    _convert(table, column, temp, convert)
+    with op.batch_alter_table(table) as batch_op:
+        batch_op.drop_column(column)
+        batch_op.alter_column(temp, new_column_name=column)
+
+def upgrade() -> None:
+    # JSON 数组转换为连续的 float32 字节
+    for table, column in VECTOR_COLUMNS:
+        _replace_column(table, column, sa.LargeBinary(), _to_blob)
+
+def downgrade() -> None:
+    # float32 字节还原为 JSON 数组
+    for table, column in VECTOR_COLUMNS:
+        _replace_column(table, column, JSON(), _to_json)
@@ -1,21 +1,38 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Header, Response
+from fastapi.responses import StreamingResponse
 from app.models.base import ResponseStatus, BaseResponse
 from app.services.qwen_service import qwen_service
-from app.services.executor import execute_tool
+from app.services.executor import execute_tool, execute_tool_stream
+from app.services.streaming import emit_event, stream_events
+from app.services.conversation_store import conversation_store, is_reserved_session_id
+from app.services.summarizer import conversation_summarizer
+from app.services.intent_router import intent_router
+from app.core.config import settings
+from app.core import metrics
+from app.core import deadline
 from app.core.logger import logger
-from app.core.tools import FUNCTION_CALLING_TOOLS, tool_desc
-from typing import List, Dict, Any
+from app.core.tools import FUNCTION_CALLING_TOOLS
+from app.core.prompts import intent_prompt
+from typing import AsyncIterator, List, Dict, Any, Optional
+import asyncio
 import json
+import uuid
 
 api_router = APIRouter()
 
-# 对话历史记录
-histories = [{
-    "role": "system",
-    "content": "你是一个专业资深的出行推荐官，能够更加用户需求给出精准的出行推荐"
-}]
+SESSION_HEADER = "X-Session-ID"
 
-def print_chat_history():
+def resolve_session_id(session_id: Optional[str], header_session_id: Optional[str]) -> str:
+    """确定会话ID：优先使用请求头，其次是请求参数，都没有时生成新会话
+
+    内部保留的会话ID（如工具执行记录）不能由客户端使用，否则会读取到其他用户的数据
+    """
+    resolved = header_session_id or session_id
+    if resolved and is_reserved_session_id(resolved):
+        raise HTTPException(status_code=400, detail="会话ID不可用")
+    return resolved or uuid.uuid4().hex
+
+def print_chat_history(histories: List[Dict[str, str]]):
     """打印当前对话历史"""
     logger.info("\n=== 当前对话历史 ===")
     for idx, msg in enumerate(histories):
@@ -44,104 +61,101 @@ async def optimization(messages: list) -> str:
         logger.error(f"对话优化失败: {str(e)}")
         return ""
 
-def generate_prompt(query: str) -> str:
-    return f"""
-解析用户意图: {query}
-
-你是一位资深旅行规划师，请根据用户输入及上下文，严格按以下规则输出JSON格式的功能调用：
-
-### 可用工具列表：
-{tool_desc}
-
-### 强制规则：
-1. 必须按照以下JSON格式输出，不要添加其他描述：
-{{
-  "actionType": "singleFunction" 或 "multiFunction", // 单功能或多功能调用
-  "functions": [
-    {{
-      "funcName": "工具名称",
-      "parameters": [
-        {{ "name": "参数名1", "value": "参数值1" }},
-        {{ "name": "参数名2", "value": "参数值2" }}
-      ]
-    }},
-    ...更多功能 (仅当actionType为multiFunction时)
-  ]
-}}
-
-2. 工具名称必须从可用工具列表中选择，禁止编造新工具
-3. 参数需从输入中直接抽取，禁止自行生成或假设值
-4. 如果需要多工具协作处理，将actionType设为"multiFunction"并按顺序添加多个功能
-5. 如果无法匹配具体工具，使用"general_tool"作为通用工具
-
-### 工具调用规则：
-1. 景点搜索工具(search_spots)：
-   - 用于搜索特定景点信息
-   - 参数：query（搜索关键词）
-   - 返回：景点基本信息列表
-
-2. 路线规划工具(plan_route)：
-   - 用于规划多个景点的游览路线
-   - 参数：spots（景点列表）
-   - 返回：优化后的游览路线
-
-3. 景点添加工具(add_spot)：
-   - 用于添加新的景点信息
-   - 参数：name（景点名称）、description（描述）、location（位置）
-   - 返回：添加成功的景点信息
-
-4. 通用工具(general_tool)：
-   - 用于处理无法匹配到具体工具的情况
-   - 参数：query（用户查询内容）
-   - 返回：通用回复信息
-
-### 多工具协作示例：
-当用户需要"帮我规划北京故宫和长城的游览路线"时，应该：
-1. 先使用search_spots工具分别搜索故宫和长城的信息
-2. 然后使用plan_route工具规划这两个景点的游览路线
-3. actionType应设置为"multiFunction"
-4. functions数组中应包含这两个工具的调用信息
-"""
+async def recognize_intent(query: str, optimized_content: str) -> str:
+    """调用模型解析意图，输出需要调用的工具"""
+    # 静态提示词在前，对话上下文和用户输入在后，便于推理服务复用前缀缓存
+    # 意图识别是确定性调用（temperature=0），相同输入直接使用回复缓存
+    messages = intent_prompt.render(context=optimized_content, query=query)
+    return await qwen_service.create_completion(messages, temperature=0)
+
+def stream_intent(query: str, optimized_content: str) -> AsyncIterator[str]:
+    """流式调用模型解析意图"""
+    messages = intent_prompt.render(context=optimized_content, query=query)
+    return qwen_service.stream_completion(messages, temperature=0)
+
+async def run_chat(query: str, session_id: str, timeout: Optional[float] = None) -> str:
+    """执行一次完整的对话流程，返回最终回答
+
+    Args:
+        timeout: 请求总时限（秒），为空时使用 REQUEST_TIMEOUT，期间的所有阶段共享该截止时间
+    """
+    with deadline.scope(settings.REQUEST_TIMEOUT if timeout is None else timeout):
+        # 同一会话的请求按顺序处理，避免对话轮次交错
+        async with conversation_store.lock(session_id):
+            with metrics.request_scope():
+                return await _run_chat(query, session_id)
+
+async def _run_chat(query: str, session_id: str) -> str:
+    # 1. 获取会话历史并加入用户消息
+    with metrics.stage("history_read"):
+        histories = await conversation_store.get_messages(session_id)
+    histories.append({"role": "user", "content": query})
+    # print_chat_history(histories)  # 打印添加用户消息后的历史
+
+    # 2. 优化多轮对话内容
+    emit_event("stage", stage="summary")
+    with metrics.stage("summary"):
+        if settings.SUMMARY_MODE == "full":
+            optimized_content = await optimization(histories[-5:])  # 只取最近5轮对话进行优化
+        else:
+            optimized_content = await conversation_summarizer.context_for(session_id, query, histories)
+
+    # 3. 优先使用本地意图路由，置信度不足时再调用模型
+    emit_event("stage", stage="intent")
+    response = None
+    routed = None
+    if settings.INTENT_ROUTER_ENABLED:
+        with metrics.stage("intent_router"):
+            routed = await asyncio.to_thread(intent_router.route, query)
+    if routed:
+        response = json.dumps(routed, ensure_ascii=False)
+    elif not settings.INTENT_STREAMING:
+        # 流式意图识别的耗时由 execute_tool_stream 按同一阶段统计
+        with metrics.stage("intent"):
+            try:
+                response = await deadline.run(recognize_intent(query, optimized_content), "intent")
+            except deadline.DeadlineExceeded as e:
+                # 意图识别超时时由 execute_tool 回退到通用工具
+                logger.warning(f"意图识别超时: {str(e)}")
+                response = ""
+    # print(f'response: {response}')
+
+    # 4. 执行工具调用（流式意图识别时，每个功能解析完成即开始执行）
+    with metrics.stage("tools"):
+        if response is None:
+            result = await execute_tool_stream(stream_intent(query, optimized_content), optimized_content, query)
+        else:
+            result = await execute_tool(response, optimized_content, query)
+    logger.info(f"result: {result}")
+    # 5. 记录本轮对话并更新滚动摘要
+    with metrics.stage("history_write"):
+        await conversation_store.add_turn(session_id, query, result)
+    if settings.SUMMARY_MODE != "full":
+        if settings.SUMMARY_BACKGROUND:
+            conversation_summarizer.schedule_fold(session_id, query, result)
+        else:
+            await conversation_summarizer.fold(session_id, query, result)
+    return result
 
 @api_router.post("/chat", response_model=BaseResponse)
-async def chat_endpoint(query: str):
+async def chat_endpoint(
+    query: str,
+    response: Response,
+    session_id: Optional[str] = None,
+    x_session_id: Optional[str] = Header(None)
+):
     """
     处理用户查询
+
+    会话ID可通过 X-Session-ID 请求头或 session_id 参数传入，未传入时创建新会话，
+    并通过响应头 X-Session-ID 返回。
     """
+    session_id = resolve_session_id(session_id, x_session_id)
+    response.headers[SESSION_HEADER] = session_id
     try:
-        # 1. 添加用户消息到历史记录
-        histories.append({"role": "user", "content": query})
-        # print_chat_history()  # 打印添加用户消息后的历史
-        
-        # 2. 优化多轮对话内容
-        optimized_content = await optimization(histories[-5:])  # 只取最近5轮对话进行优化
-        
-        # 3. 生成提示词
-        prompt = generate_prompt(query)
-        
-        # 4. 调用模型解析意图，使用优化后的对话内容
-        messages = [{
-            "role": "system",
-            "content": "你是一个专业的出行推荐官"
-        }]
-        if optimized_content:
-            messages.append({
-                "role": "assistant",
-                "content": optimized_content
-            })
-        messages.append({"role": "user", "content": prompt})
-        # 意图识别，输出需要调用的工具
-        response = await qwen_service.create_completion(messages)
-        # print(f'response: {response}')
-        
-        # 5. 执行工具调用
-        result = await execute_tool(response, optimized_content, query)
-        logger.info(f"result: {result}")
-        # 6. 添加助手回复到历史记录
-        histories.append({"role": "assistant", "content": result})
-        # print_chat_history()  # 打印添加助手回复后的历史
-        
-        # 7. 返回结果
+        result = await run_chat(query, session_id)
+
+        # 返回结果
         return BaseResponse(
             status=ResponseStatus.SUCCESS,
             message="处理成功",
@@ -153,4 +167,26 @@ async def chat_endpoint(query: str):
             status=ResponseStatus.ERROR,
             message=str(e),
             data=None
-        ) 
\ No newline at end of file
+        )
+
+@api_router.post("/chat/stream")
+async def chat_stream_endpoint(
+    query: str,
+    session_id: Optional[str] = None,
+    x_session_id: Optional[str] = Header(None)
+):
+    """
+    流式处理用户查询（Server-Sent Events）
+
+    事件类型：
+    - stage: 处理阶段进度（summary / intent / tool / followup）
+    - answer_start / token / answer_end: 回答生成过程中的文本片段
+    - done: 最终完整结果
+    - error: 处理失败
+    """
+    session_id = resolve_session_id(session_id, x_session_id)
+    return StreamingResponse(
+        stream_events(lambda: run_chat(query, session_id)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", SESSION_HEADER: session_id}
+    )
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Any, Dict, List, Optional
 import os
 from dotenv import load_dotenv
 
@@ -17,7 +17,89 @@ class Settings(BaseSettings):
     # Qwen API配置
     QWEN_API_URL: str = "http://103.237.29.236:10069/de_learning/v1"
     QWEN_MODEL_NAME: str = "Qwen/Qwen2.5-7B-Instruct"
+    QWEN_MAX_CONNECTIONS: int = 100  # 连接池最大连接数
+    QWEN_MAX_KEEPALIVE_CONNECTIONS: int = 20  # 保持活跃的空闲连接数
+    QWEN_KEEPALIVE_EXPIRY: float = 30.0  # 空闲连接保活时间（秒）
+    QWEN_CONNECT_TIMEOUT: float = 5.0  # 建立连接超时（秒）
+    QWEN_TIMEOUT: float = 120.0  # 单次调用默认超时（秒）
+    QWEN_MAX_RETRIES: int = 2  # 失败重试次数
+
+    # 大模型回复缓存配置
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_MAX_ENTRIES: int = 2048  # 内存层最大条目数
+    LLM_CACHE_MAX_BYTES: int = 64 * 1024 * 1024  # 内存层最大占用字节数
+    LLM_CACHE_TTL: float = 3600.0  # 缓存过期时间（秒）
+    LLM_CACHE_SQLITE_PATH: Optional[str] = None  # 磁盘层路径，为空则不启用
+
+    # 合并并发的相同调用（大模型调用、向量检索）
+    SINGLEFLIGHT_ENABLED: bool = True
+
+    # 会话存储配置
+    CONVERSATION_BACKEND: str = "memory"  # memory / database
+    CONVERSATION_MAX_TURNS: int = 20  # 每个会话保留的对话轮数
+    CONVERSATION_MAX_SESSIONS: int = 10000  # 最多保留的会话数
+    CONVERSATION_MAX_BYTES: int = 64 * 1024 * 1024  # 所有会话内容的内存上限
+    CONVERSATION_IDLE_TTL: float = 3600.0  # 会话空闲过期时间（秒）
+
+    # 对话摘要配置
+    SUMMARY_MODE: str = "incremental"  # incremental: 增量滚动摘要 / full: 每轮重新总结最近对话
+    SUMMARY_BACKGROUND: bool = True  # 增量模式下是否在响应返回后于后台更新摘要
+
+    # 本地意图路由配置（置信度不足时回退到大模型意图识别）
+    INTENT_ROUTER_ENABLED: bool = False
+    INTENT_ROUTER_THRESHOLD: float = 0.8  # 最高相似度阈值
+    INTENT_ROUTER_MARGIN: float = 0.05  # 与次佳工具的最小相似度差距
+
+    # 意图识别配置
+    INTENT_STREAMING: bool = True  # 流式解析意图识别结果，每个功能解析完成即开始执行
     
+    # 指标配置
+    METRICS_ENABLED: bool = True  # 是否统计各阶段耗时并通过 /metrics 导出
+
+    # 工具执行配置
+    TOOL_MAX_CONCURRENCY: int = 4  # 多工具调用时的最大并发数
+
+    # 追问配置
+    FOLLOWUP_MAX_ITERATIONS: int = 2  # 每个工具最多追问的轮数，0 表示不追问
+    FOLLOWUP_MAX_TOKENS: int = 16000  # 追问阶段最多消耗的 token 数（估算）
+    COMPLETENESS_THRESHOLD: float = 1.0  # 本地完整度评分达到该值时跳过大模型检查
+    # 回答与自评合并为一次调用的工具（JSON 列表，"*" 表示所有工具），其余工具单独调用追问检查
+    SELF_ASSESSMENT_TOOLS: List[str] = []
+
+    # 向量索引快照配置
+    VECTOR_INDEX_DIR: Optional[str] = "data/vector_index"  # 快照目录，为空则不保存快照
+    VECTOR_INDEX_MMAP: bool = True  # 以内存映射方式加载快照，多个工作进程共享页缓存
+    VECTOR_PRELOAD_COLLECTIONS: List[str] = ["spots", "routes"]  # 启动时预加载的集合
+
+    # 向量索引类型配置，可用参数见 app/services/index_factory.py
+    VECTOR_INDEX_DEFAULT: Dict[str, Any] = {"type": "flat"}  # 所有集合的默认配置
+    # 集合名称 -> 索引配置（覆盖默认配置），如 {"spots": {"type": "hnsw", "train_threshold": 50000}}
+    VECTOR_INDEX_CONFIGS: Dict[str, Dict[str, Any]] = {}
+    VECTOR_ENCODE_BATCH_SIZE: int = 64  # 批量写入时每次编码的文本数
+    VECTOR_INSERT_CHUNK_SIZE: int = 1000  # 批量写入时每个数据库事务写入的记录数
+    VECTOR_SYNC_ENABLED: bool = True  # 景点/路线增删改时同步更新对应记录的向量
+
+    # 向量模型配置：模型在首次编码时加载，服务启动时预热
+    EMBEDDING_MODEL_NAME: str = "all-MiniLM-L6-v2"
+    EMBEDDING_WARMUP_ENABLED: bool = True  # 启动时加载模型并编码示例文本，完成后 /ready 才返回就绪
+
+    # 请求截止时间与各阶段预算（秒），0 表示不限制
+    REQUEST_TIMEOUT: float = 60.0  # 单次对话请求的总时限
+    INTENT_TIMEOUT: float = 15.0  # 意图识别
+    RAG_TIMEOUT: float = 5.0  # 检索增强
+    TOOL_TIMEOUT: float = 45.0  # 单个工具执行
+    FOLLOWUP_CHECK_TIMEOUT: float = 10.0  # 追问判断
+
+    # 工具结果缓存配置（各工具的过期时间等策略见 app/core/tools.py）
+    TOOL_CACHE_ENABLED: bool = False
+    TOOL_CACHE_MAX_ENTRIES: int = 1024  # 最大条目数
+    TOOL_CACHE_MAX_BYTES: int = 32 * 1024 * 1024  # 最大占用字节数
+
+    # 执行记录批量写入配置
+    RECORD_WRITER_BATCH_SIZE: int = 50  # 每批最多写入的记录数
+    RECORD_WRITER_FLUSH_INTERVAL: float = 1.0  # 最长等待时间（秒），到时即写入
+    RECORD_WRITER_QUEUE_SIZE: int = 1000  # 队列上限，满时提交方等待
+
     # 日志配置
     LOG_LEVEL: str = "INFO"
     LOG_FILE: str = "logs/app.log"
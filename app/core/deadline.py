@@ -0,0 +1,110 @@
+from app.core.config import settings
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, List, Optional
+import asyncio
+import inspect
+import time
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """请求截止时间或阶段预算已用完"""
+
+    def __init__(self, message: str = "请求处理超时"):
+        super().__init__(message)
+
+# 各阶段的时间预算（秒），实际可用时间同时受请求剩余时间限制，0 表示不单独限制
+STAGE_BUDGETS = {
+    "intent": settings.INTENT_TIMEOUT,
+    "rag": settings.RAG_TIMEOUT,
+    "tool": settings.TOOL_TIMEOUT,
+    "followup_check": settings.FOLLOWUP_CHECK_TIMEOUT,
+}
+
+# 外层保护（如整个工具）的宽限时间：让内层的大模型调用先到期并返回部分结果
+GRACE_PERIOD = 0.5
+
+# 当前请求的截止时间（time.monotonic），为空表示不限制
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+# 当前作用域内因超时产生的部分或降级结果的原因；使用可变列表，
+# 在 wait_for 创建的子任务中（复制的上下文）标记也对外层可见
+_partial: ContextVar[Optional[List[str]]] = ContextVar("partial_results", default=None)
+
+@contextmanager
+def scope(seconds: Optional[float]):
+    """设置当前请求的截止时间，嵌套时以更早的截止时间为准"""
+    deadline = time.monotonic() + seconds if seconds else None
+    current = _deadline.get()
+    if current is not None and (deadline is None or current < deadline):
+        deadline = current
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+@contextmanager
+def detached():
+    """脱离当前请求的截止时间，用于响应返回后仍在后台执行的任务"""
+    token = _deadline.set(None)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+@contextmanager
+def track_partial():
+    """记录作用域内产生的部分或降级结果，返回原因列表（为空表示结果完整）"""
+    marks: List[str] = []
+    token = _partial.set(marks)
+    try:
+        yield marks
+    finally:
+        _partial.reset(token)
+
+def mark_partial(reason: str):
+    """标记当前结果为超时后的部分或降级结果，这类结果不应缓存"""
+    marks = _partial.get()
+    if marks is not None:
+        marks.append(reason)
+
+def remaining() -> Optional[float]:
+    """当前请求剩余的时间（秒），没有截止时间时返回 None"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.monotonic())
+
+def expired() -> bool:
+    """当前请求是否已过截止时间"""
+    left = remaining()
+    return left is not None and left <= 0
+
+def budget(stage: Optional[str] = None) -> Optional[float]:
+    """阶段可用的时间：阶段预算与请求剩余时间中的较小者"""
+    left = remaining()
+    stage_budget = STAGE_BUDGETS.get(stage) if stage else None
+    if not stage_budget:
+        return left
+    return stage_budget if left is None else min(stage_budget, left)
+
+async def run(awaitable: Awaitable, stage: Optional[str] = None, grace: float = 0.0) -> Any:
+    """在阶段预算内等待执行结果，超时时取消执行并抛出 DeadlineExceeded
+
+    Args:
+        stage: 阶段名称，为空时只受请求剩余时间限制
+        grace: 在预算之外额外等待的时间，用于外层保护
+    """
+    timeout = budget(stage)
+    if timeout is None:
+        return await awaitable
+    label = f"{stage} 阶段" if stage else "请求"
+    if timeout <= 0 and not grace:
+        if inspect.iscoroutine(awaitable):
+            awaitable.close()
+        raise DeadlineExceeded(f"{label}处理超时")
+    try:
+        return await asyncio.wait_for(awaitable, timeout + grace)
+    except asyncio.TimeoutError as e:
+        if isinstance(e, DeadlineExceeded):
+            raise
+        raise DeadlineExceeded(f"{label}处理超时（{timeout + grace:.1f}s）") from None
@@ -0,0 +1,212 @@
+from app.core.config import settings
+from bisect import bisect_left
+from contextlib import nullcontext
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+import threading
+import time
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+COUNT_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 55)
+TOKEN_BUCKETS = (100, 500, 1000, 2000, 5000, 10000, 20000, 50000, 100000)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(key) + ([extra] if extra else [])
+    if not items:
+        return ""
+    escaped = (
+        f'{name}="' + value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+        for name, value in items
+    )
+    return "{" + ",".join(escaped) + "}"
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+class Counter:
+    """单调递增计数器"""
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in self._values.items():
+                lines.append(f"{self.name}{_format_labels(key)} {_format_value(value)}")
+        return lines
+
+class Histogram:
+    """直方图：按标签分别统计分桶计数、总和与次数"""
+
+    def __init__(self, name: str, documentation: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets))
+        self._values: Dict[LabelKey, List[float]] = {}  # 各桶计数 + [总和, 次数]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            if index < len(self.buckets):
+                state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, state in self._values.items():
+                cumulative = 0
+                for bound, count in zip(self.buckets, state):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_format_labels(key, ('le', _format_value(bound)))} {cumulative}")
+                lines.append(f"{self.name}_bucket{_format_labels(key, ('le', '+Inf'))} {state[-1]}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(state[-2])}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {state[-1]}")
+        return lines
+
+# 收集器返回 (指标名, 说明, 标签, 值)，以 gauge 形式导出
+Collector = Callable[[], Iterable[Tuple[str, str, Dict[str, str], float]]]
+
+class MetricsRegistry:
+    """指标注册表，负责导出 Prometheus 文本格式"""
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._metrics: List = []
+        self._collectors: List[Collector] = []
+
+    def counter(self, name: str, documentation: str) -> Counter:
+        metric = Counter(name, documentation)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, documentation: str, buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, documentation, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector: Collector):
+        """注册在导出时调用的收集器，用于导出缓存命中等外部统计"""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        gauges: Dict[str, Tuple[str, List[str]]] = {}
+        for collector in self._collectors:
+            for name, documentation, labels, value in collector():
+                _, samples = gauges.setdefault(name, (documentation, []))
+                samples.append(f"{name}{_format_labels(_label_key(labels))} {_format_value(value)}")
+        for name, (documentation, samples) in gauges.items():
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} gauge")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+registry = MetricsRegistry(enabled=settings.METRICS_ENABLED)
+
+STAGE_DURATION = registry.histogram("travel_stage_duration_seconds", "Duration of chat pipeline stages")
+TOOL_DURATION = registry.histogram("travel_tool_duration_seconds", "Duration of tool executions")
+LLM_CALL_DURATION = registry.histogram("travel_llm_call_duration_seconds", "Duration of LLM calls by call site")
+LLM_CALLS = registry.counter("travel_llm_calls_total", "LLM calls by call site")
+LLM_TOKENS = registry.counter("travel_llm_tokens_total", "LLM tokens by call site and type")
+HTTP_REQUEST_DURATION = registry.histogram("travel_http_request_duration_seconds", "Duration of HTTP requests")
+REQUEST_LLM_CALLS = registry.histogram("travel_request_llm_calls", "LLM calls per chat request", COUNT_BUCKETS)
+REQUEST_LLM_TOKENS = registry.histogram("travel_request_llm_tokens", "LLM tokens per chat request", TOKEN_BUCKETS)
+FOLLOWUP_DECISIONS = registry.counter("travel_followup_decisions_total", "Answer completeness decisions by path")
+
+# 当前阶段（用于标记大模型调用点）和当前请求的统计
+_current_stage: ContextVar[str] = ContextVar("metrics_stage", default="other")
+_request_stats: ContextVar[Optional[Dict[str, int]]] = ContextVar("metrics_request_stats", default=None)
+
+class _StageTimer:
+    def __init__(self, histogram: Histogram, stage: Optional[str], labels: Dict[str, str]):
+        self.histogram = histogram
+        self.stage = stage
+        self.labels = labels
+
+    def __enter__(self):
+        self._token = _current_stage.set(self.stage) if self.stage else None
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self._start, **self.labels)
+        if self._token is not None:
+            _current_stage.reset(self._token)
+        return False
+
+def stage(name: str):
+    """统计一个处理阶段的耗时，并将其作为阶段内大模型调用的调用点标签"""
+    if not registry.enabled:
+        return nullcontext()
+    return _StageTimer(STAGE_DURATION, name, {"stage": name})
+
+def tool_timer(tool_name: str):
+    """统计单个工具的执行耗时"""
+    if not registry.enabled:
+        return nullcontext()
+    return _StageTimer(TOOL_DURATION, f"tool:{tool_name}", {"tool": tool_name})
+
+def current_stage() -> str:
+    return _current_stage.get()
+
+def record_llm_call(duration: float, prompt_tokens: int = 0, completion_tokens: int = 0):
+    """记录一次大模型调用"""
+    if not registry.enabled:
+        return
+    site = _current_stage.get()
+    LLM_CALL_DURATION.observe(duration, site=site)
+    LLM_CALLS.inc(site=site)
+    if prompt_tokens:
+        LLM_TOKENS.inc(prompt_tokens, site=site, type="prompt")
+    if completion_tokens:
+        LLM_TOKENS.inc(completion_tokens, site=site, type="completion")
+    stats = _request_stats.get()
+    if stats is not None:
+        stats["llm_calls"] += 1
+        stats["tokens"] += prompt_tokens + completion_tokens
+
+def record_followup(path: str):
+    """记录一次回答完整度判断走的路径"""
+    if registry.enabled:
+        FOLLOWUP_DECISIONS.inc(path=path)
+
+class _RequestScope:
+    def __enter__(self):
+        self.stats = {"llm_calls": 0, "tokens": 0}
+        self._token = _request_stats.set(self.stats)
+        return self
+
+    def __exit__(self, *exc):
+        _request_stats.reset(self._token)
+        REQUEST_LLM_CALLS.observe(self.stats["llm_calls"])
+        REQUEST_LLM_TOKENS.observe(self.stats["tokens"])
+        return False
+
+def request_scope():
+    """统计一次对话请求中的大模型调用次数和 token 数"""
+    if not registry.enabled:
+        return nullcontext()
+    return _RequestScope()
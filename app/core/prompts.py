@@ -0,0 +1,116 @@
+from app.core.tools import tool_desc
+from app.core.tokens import count_tokens
+from typing import Dict, List, Optional, Tuple
+
+class PromptTemplate:
+    """预编译的提示词模板
+
+    静态部分（系统设定、工具描述、规则等）在启动时拼接一次，固定放在消息最前面；
+    每次请求变化的内容（对话摘要、用户输入）放在最后。这样推理服务的前缀缓存
+    （如 vLLM automatic prefix caching）可以在不同请求之间复用静态部分的 KV。
+    """
+
+    def __init__(self, name: str, static_sections: List[Tuple[str, str]], dynamic_template: str):
+        """
+        Args:
+            name: 模板名称
+            static_sections: 按顺序排列的 (段名, 内容) 静态段
+            dynamic_template: 变量部分模板，使用 str.format 占位符
+        """
+        self.name = name
+        self.static_sections = static_sections
+        self.dynamic_template = dynamic_template
+        self.static_text = "\n\n".join(text.strip() for _, text in static_sections)
+        self._section_tokens = {section: count_tokens(text) for section, text in static_sections}
+        self._static_tokens = count_tokens(self.static_text)
+
+    def render(self, context: Optional[str] = None, **variables) -> List[Dict[str, str]]:
+        """生成消息列表：静态系统提示词 → 对话上下文 → 本次请求内容"""
+        messages = [{"role": "system", "content": self.static_text}]
+        if context:
+            messages.append({"role": "assistant", "content": context})
+        messages.append({"role": "user", "content": self.dynamic_template.format(**variables)})
+        return messages
+
+    def token_counts(self, context: Optional[str] = None, **variables) -> Dict[str, int]:
+        """各段的 token 数，传入变量时同时统计变量部分"""
+        counts = dict(self._section_tokens)
+        counts["static_total"] = self._static_tokens
+        if context:
+            counts["context"] = count_tokens(context)
+        if variables:
+            counts["dynamic"] = count_tokens(self.dynamic_template.format(**variables))
+        return counts
+
+INTENT_ROLE = """
+你是一个专业的出行推荐官。
+你是一位资深旅行规划师，请根据用户输入及上下文，严格按以下规则输出JSON格式的功能调用：
+"""
+
+INTENT_TOOLS = f"""
+### 可用工具列表：
+{tool_desc}
+"""
+
+INTENT_RULES = """
+### 强制规则：
+1. 必须按照以下JSON格式输出，不要添加其他描述：
+{
+  "actionType": "singleFunction" 或 "multiFunction", // 单功能或多功能调用
+  "functions": [
+    {
+      "funcName": "工具名称",
+      "parameters": [
+        { "name": "参数名1", "value": "参数值1" },
+        { "name": "参数名2", "value": "参数值2" }
+      ]
+    },
+    ...更多功能 (仅当actionType为multiFunction时)
+  ]
+}
+
+2. 工具名称必须从可用工具列表中选择，禁止编造新工具
+3. 参数需从输入中直接抽取，禁止自行生成或假设值
+4. 如果需要多工具协作处理，将actionType设为"multiFunction"并按顺序添加多个功能
+5. 如果无法匹配具体工具，使用"general_tool"作为通用工具
+6. 多工具调用时，如果某个工具需要使用前面工具的结果，可在该功能中添加 "dependsOn": [前序功能的下标(从0开始)]；相互独立的工具不要添加
+
+### 工具调用规则：
+1. 景点搜索工具(search_spots)：
+   - 用于搜索特定景点信息
+   - 参数：query（搜索关键词）
+   - 返回：景点基本信息列表
+
+2. 路线规划工具(plan_route)：
+   - 用于规划多个景点的游览路线
+   - 参数：spots（景点列表）
+   - 返回：优化后的游览路线
+
+3. 景点添加工具(add_spot)：
+   - 用于添加新的景点信息
+   - 参数：name（景点名称）、description（描述）、location（位置）
+   - 返回：添加成功的景点信息
+
+4. 通用工具(general_tool)：
+   - 用于处理无法匹配到具体工具的情况
+   - 参数：query（用户查询内容）
+   - 返回：通用回复信息
+
+### 多工具协作示例：
+当用户需要"帮我规划北京故宫和长城的游览路线"时，应该：
+1. 先使用search_spots工具分别搜索故宫和长城的信息
+2. 然后使用plan_route工具规划这两个景点的游览路线
+3. actionType应设置为"multiFunction"
+4. functions数组中应包含这两个工具的调用信息
+"""
+
+# 意图识别提示词：静态部分在模块加载时预编译
+intent_prompt = PromptTemplate(
+    name="intent",
+    static_sections=[
+        ("role", INTENT_ROLE),
+        ("tools", INTENT_TOOLS),
+        ("rules", INTENT_RULES),
+    ],
+    dynamic_template="解析用户意图: {query}"
+)
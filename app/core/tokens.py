@@ -0,0 +1,13 @@
+from typing import Dict, List
+import re
+
+# 估算 token 数：中日韩字符按单字计，其余按单词/标点计
+_TOKEN_PATTERN = re.compile(r"[一-鿿　-〿＀-￯]|[A-Za-z]+|\d+|[^\sA-Za-z\d]")
+
+def count_tokens(text: str) -> int:
+    """估算文本的 token 数"""
+    return len(_TOKEN_PATTERN.findall(text))
+
+def count_message_tokens(messages: List[Dict[str, str]]) -> int:
+    """估算消息列表的 token 数"""
+    return sum(count_tokens(message.get("content") or "") for message in messages)
@@ -13,7 +13,7 @@ from app.services.tools import tool_funcs
 #    - 参数: spot_list (景点列表)
    
 # 2. spot_recommend: 景点推荐
-#    - 参数: season (季节), days (天数), preference (偏好)
+#    - 参数: season (季节), days (天数), preference (偏好), location (地区), min_rating (最低评分)
    
 # 3. spot_route_recommend: 路线规划
 #    - 参数: spot_name (景点名称), transport (交通方式), time_budget (时间预算)
@@ -102,11 +102,18 @@ logger.info(f"可调用工具数量：{len(tool_registry.list_tools())}")
 #         logger.error(f"添加景点失败: {str(e)}")
 #         return {}
 
+# 工具结果缓存策略（"cache" 字段，未声明则不缓存）：
+# - ttl: 缓存有效期（秒）
+# - summary: 对话摘要参与缓存键的方式，hash 表示按摘要哈希区分（默认），exclude 表示忽略；
+#   工具回答由大模型结合摘要生成、因用户而异，只有结果与摘要无关的工具才能使用 exclude
+# - depends_on: 依赖的数据集合，集合数据变化时缓存失效
+# - list_params: 列表类参数，生成缓存键时按分隔符拆分并排序元素，其他参数按原文区分
 FUNCTION_CALLING_TOOLS = [
     {
         "name_for_model": "search_spot_info",
         "name_for_human": "查询景点信息",
         "description_for_human": "根据关键词搜索景点详情（如开放时间、票价、交通方式等实用信息）",
+        "cache": {"ttl": 3600, "summary": "hash", "depends_on": ["spots"], "list_params": ["spot_list"]},
         "parameters": [{
             "description": "景点名称列表,不同景点之间使用英文逗号连接",
             "name": "spot_list",
@@ -120,6 +127,7 @@ FUNCTION_CALLING_TOOLS = [
         "name_for_model": "spot_recommend",
         "name_for_human": "景点推荐",
         "description_for_human": "根据用户需求推荐合适的景点",
+        "cache": {"ttl": 1800, "summary": "hash", "depends_on": ["spots"]},
         "parameters": [
             {
                 "description": "旅行季节",
@@ -138,6 +146,18 @@ FUNCTION_CALLING_TOOLS = [
                 "name": "preference",
                 "required": False,
                 "schema": {"type": "string"}
+            },
+            {
+                "description": "景点所在地区（如北京、东城区）",
+                "name": "location",
+                "required": False,
+                "schema": {"type": "string"}
+            },
+            {
+                "description": "最低评分（0-5）",
+                "name": "min_rating",
+                "required": False,
+                "schema": {"type": "number"}
             }
         ]
     },
@@ -145,6 +165,7 @@ FUNCTION_CALLING_TOOLS = [
         "name_for_model": "spot_route_recommend",
         "name_for_human": "路线推荐",
         "description_for_human": "规划详细的景点游览路线",
+        "cache": {"ttl": 1800, "summary": "hash", "depends_on": ["routes"]},
         "parameters": [
             {
                 "description": "需要规划路线的景点名称",
@@ -170,6 +191,7 @@ FUNCTION_CALLING_TOOLS = [
         "name_for_model": "deep_search",
         "name_for_human": "深度思考",
         "description_for_human": "深度分析用户需求并提供个性化建议",
+        "cache": {"ttl": 900, "summary": "hash", "depends_on": ["spots", "routes"]},
         "parameters": [{
             "description": "重点关注的方面（如文化体验、美食、活动等）",
             "name": "focus",
@@ -200,6 +222,7 @@ FUNCTION_CALLING_TOOLS = [
         "name_for_model": "travel_tips",
         "name_for_human": "旅行贴士",
         "description_for_human": "提供目的地的实用旅行建议",
+        "cache": {"ttl": 86400, "summary": "hash", "depends_on": ["spots", "routes"]},
         "parameters": [
             {
                 "description": "目的地名称",
@@ -244,4 +267,11 @@ def parse_tool_text_info(tools, template):
 
 # 生成工具描述和名称列表
 FUNCTION_CALLING_TOOL_DESC = "(name_for_model): Call this tool to interact with the (name_for_human) API. What is the (name_for_human) API useful for (description_for_human)?"
-tool_desc, tool_names = parse_tool_text_info(FUNCTION_CALLING_TOOLS, FUNCTION_CALLING_TOOL_DESC) 
\ No newline at end of file
+tool_desc, tool_names = parse_tool_text_info(FUNCTION_CALLING_TOOLS, FUNCTION_CALLING_TOOL_DESC)
+
+# 工具结果缓存策略
+TOOL_CACHE_POLICIES = {
+    tool["name_for_model"]: tool["cache"]
+    for tool in FUNCTION_CALLING_TOOLS
+    if tool.get("cache")
+}
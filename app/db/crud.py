@@ -1,7 +1,24 @@
 from sqlalchemy.orm import Session
+from app.core.logger import logger
 from app.models.base import SpotInfo, RouteInfo
 from app.db.models import Spot, Route
-from typing import List, Optional
+from typing import Callable, List, Optional
+
+# 数据变更监听器：(集合名, 操作, 记录ID)，用于缓存失效等
+ChangeListener = Callable[[str, str, int], None]
+_change_listeners: List[ChangeListener] = []
+
+def register_change_listener(listener: ChangeListener):
+    """注册景点/路线数据变更的监听器"""
+    _change_listeners.append(listener)
+
+def notify_change(collection: str, action: str, record_id: int):
+    """通知数据变更，监听器异常不影响数据写入"""
+    for listener in _change_listeners:
+        try:
+            listener(collection, action, record_id)
+        except Exception as e:
+            logger.error(f"数据变更监听器执行失败: {str(e)}")
 
 def create_spot(db: Session, spot: SpotInfo) -> Spot:
     """创建新景点"""
@@ -16,6 +33,7 @@ def create_spot(db: Session, spot: SpotInfo) -> Spot:
     db.add(db_spot)
     db.commit()
     db.refresh(db_spot)
+    notify_change("spots", "create", db_spot.id)
     return db_spot
 
 def get_spots(db: Session, query: str, skip: int = 0, limit: int = 10) -> List[Spot]:
@@ -39,6 +57,7 @@ def create_route(db: Session, route: RouteInfo) -> Route:
     db.add(db_route)
     db.commit()
     db.refresh(db_route)
+    notify_change("routes", "create", db_route.id)
     return db_route
 
 def get_route(db: Session, route_id: int) -> Optional[Route]:
@@ -53,6 +72,7 @@ def update_spot(db: Session, spot_id: int, spot: SpotInfo) -> Optional[Spot]:
             setattr(db_spot, key, value)
         db.commit()
         db.refresh(db_spot)
+        notify_change("spots", "update", spot_id)
     return db_spot
 
 def delete_spot(db: Session, spot_id: int) -> bool:
@@ -61,5 +81,6 @@ def delete_spot(db: Session, spot_id: int) -> bool:
     if db_spot:
         db.delete(db_spot)
         db.commit()
+        notify_change("spots", "delete", spot_id)
         return True
     return False 
\ No newline at end of file
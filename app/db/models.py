@@ -3,6 +3,7 @@ from typing import List, Dict, Any
 from sqlalchemy import Column, Integer, String, Text, Float, DateTime, ForeignKey
 from sqlalchemy.dialects.sqlite import JSON
 from app.db.base import Base
+from app.db.types import Float32Vector
 from zoneinfo import ZoneInfo
 
 UTC = ZoneInfo("UTC")
@@ -18,7 +19,7 @@ class Spot(Base):
     images = Column(JSON)  # 图片URL列表
     tags = Column(JSON)  # 标签列表
     rating = Column(Float)  # 评分
-    vector_embedding = Column(JSON)  # 向量嵌入
+    vector_embedding = Column(Float32Vector)  # 向量嵌入（float32 字节）
     created_at = Column(DateTime, default=lambda: datetime.now(UTC))
     updated_at = Column(DateTime, default=lambda: datetime.now(UTC), onupdate=lambda: datetime.now(UTC))
 
@@ -87,7 +88,7 @@ class VectorIndex(Base):
     id = Column(Integer, primary_key=True)
     collection_name = Column(String)  # spots, routes, chat_histories 等
     record_id = Column(Integer)  # 对应记录的ID
-    vector = Column(JSON)  # 向量数据
+    vector = Column(Float32Vector)  # 向量数据（float32 字节）
     meta_info = Column(JSON)  # 额外元数据
     created_at = Column(DateTime, default=lambda: datetime.now(UTC))
     updated_at = Column(DateTime, default=lambda: datetime.now(UTC), onupdate=lambda: datetime.now(UTC))
@@ -0,0 +1,28 @@
+from sqlalchemy import LargeBinary
+from sqlalchemy.types import TypeDecorator
+import numpy as np
+
+class Float32Vector(TypeDecorator):
+    """以连续 float32 字节存储的向量
+
+    写入时接受列表或 numpy 数组，读取时用 np.frombuffer 直接映射为只读的
+    float32 数组，不再逐个解析 JSON 数字。
+    """
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return np.ascontiguousarray(value, dtype=np.float32).tobytes()
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return np.frombuffer(value, dtype=np.float32)
+
+    def compare_values(self, x, y):
+        # numpy 数组的 == 逐元素比较，不能直接作为真值
+        if x is None or y is None:
+            return x is y
+        return np.array_equal(x, y)
@@ -1,17 +1,52 @@
 from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
 from app.core.logger import logger
+from app.core.prompts import intent_prompt
+from app.core import metrics
+from app.services.qwen_service import qwen_service
+from app.services.summarizer import conversation_summarizer
+from app.services.record_writer import record_writer
+from app.services.vector_store import vector_store
 from contextlib import asynccontextmanager
+import asyncio
 import time
 
+async def prepare(app: FastAPI):
+    """从快照（或数据库）预加载向量索引，同时加载并预热向量模型，完成后标记为就绪"""
+    try:
+        startup = [asyncio.to_thread(vector_store.preload, settings.VECTOR_PRELOAD_COLLECTIONS)]
+        if settings.EMBEDDING_WARMUP_ENABLED:
+            startup.append(asyncio.to_thread(vector_store.warmup))
+        await asyncio.gather(*startup)
+    except Exception as e:
+        logger.error(f"启动预热失败，服务保持未就绪: {str(e)}")
+        return
+    app.state.ready = True
+    logger.info("Application ready")
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # 启动时执行
     logger.info("Starting up application...")
+    logger.info(f"意图识别提示词各段 token 数（估算）: {intent_prompt.token_counts()}")
+    app.state.ready = False
+    await record_writer.start()
+    # 预加载和预热在后台执行，启动期间即可接受连接：/health 可用，/ready 在完成前返回 503
+    warmup_task = asyncio.create_task(prepare(app))
     yield
     # 关闭时执行
     logger.info("Shutting down application...")
+    warmup_task.cancel()
+    try:
+        await warmup_task
+    except asyncio.CancelledError:
+        pass
+    await conversation_summarizer.drain()
+    await record_writer.stop()
+    await asyncio.to_thread(vector_store.save_snapshots)
+    await qwen_service.close()
 
 app = FastAPI( 
     title=settings.PROJECT_NAME,
@@ -19,11 +54,21 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+def route_path(request: Request) -> str:
+    """指标使用的路径标签：匹配到的路由模板，未匹配的请求归入同一个值，避免标签数量随请求路径无限增长"""
+    # 新版本 FastAPI 中通过 include_router 注册的路由，scope["route"] 的路径不含前缀，完整模板在 effective_route_context 中
+    route = request.scope.get("fastapi", {}).get("effective_route_context") or request.scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
     start_time = time.time()
     response = await call_next(request)
     process_time = (time.time() - start_time) * 1000
+    if metrics.registry.enabled:
+        metrics.HTTP_REQUEST_DURATION.observe(
+            process_time / 1000, method=request.method, path=route_path(request), status=response.status_code
+        )
     logger.info(
         f"请求: {request.method} {request.url.path} "
         f"状态码: {response.status_code} "
@@ -45,6 +90,18 @@ app.add_middleware(
 async def health_check():
     return {"status": "ok"}
 
+# 就绪检查：向量索引预加载和模型预热完成后才返回 200
+@app.get("/ready")
+async def readiness_check(request: Request):
+    if not getattr(request.app.state, "ready", False):
+        return JSONResponse(status_code=503, content={"status": "starting"})
+    return {"status": "ready", "embedding_model_loaded": vector_store.model_loaded}
+
+# Prometheus 指标
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    return metrics.registry.render()
+
 # 导入路由
 from app.api.api_v1.api import api_router
 app.include_router(api_router, prefix=settings.API_V1_STR) 
\ No newline at end of file
@@ -0,0 +1,138 @@
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+import numpy as np
+import re
+
+# 支持的过滤条件：同一条件的多个值之间为“或”，不同条件之间为“且”
+# - location: 地点，匹配地址中的行政区划（如 "北京"、"北京市"、"东城区"）
+# - tags: 标签，匹配包含该词的标签（如 "历史" 匹配 "历史遗迹"）
+# - min_rating: 最低评分
+FILTER_KEYS = ("location", "tags", "min_rating")
+
+# 地址中以省/市/区/县结尾的片段
+_LOCATION_SEGMENT = re.compile(r"[^省市区县]+?[省市区县]")
+
+def location_keys(location: Optional[str]) -> Set[str]:
+    """地址的索引键：完整地址和各级行政区划（带与不带后缀）
+
+    如 "北京市东城区景山前街4号" -> {"北京市东城区景山前街4号", "北京市", "北京", "东城区", "东城"}
+    """
+    if not location:
+        return set()
+    keys = {location}
+    for segment in _LOCATION_SEGMENT.findall(location):
+        keys.add(segment)
+        if len(segment) > 1:
+            keys.add(segment[:-1])
+    return keys
+
+def _terms(value: Any) -> List[str]:
+    """过滤值统一为非空字符串列表"""
+    values = value if isinstance(value, (list, tuple, set)) else [value]
+    return [str(v).strip() for v in values if v is not None and str(v).strip()]
+
+class AttributeIndex:
+    """集合元数据的倒排索引，随向量索引一起构建和更新，用于过滤检索
+
+    地点和标签为“键 -> record_id 集合”的倒排表，检索时转换为 numpy 数组并缓存；
+    评分按升序保存为数组，按最低评分过滤时二分查找。
+    过滤结果是以 record_id 为下标的位图（布尔数组），可直接构造 FAISS 的 IDSelectorBitmap。
+    """
+
+    def __init__(self):
+        self.locations: Dict[str, Set[int]] = defaultdict(set)
+        self.tags: Dict[str, Set[int]] = defaultdict(set)
+        self.ratings: Dict[int, float] = {}
+        self._size = 0  # 位图长度：最大 record_id + 1
+        self._arrays: Dict[Tuple[str, str], np.ndarray] = {}  # (属性, 键) -> record_id 数组
+        self._sorted_ratings: Optional[Tuple[np.ndarray, np.ndarray]] = None  # (评分, record_id)，按评分升序
+
+    @classmethod
+    def build(cls, metadata: Dict[int, Dict]) -> "AttributeIndex":
+        index = cls()
+        for record_id, item in metadata.items():
+            index.add(record_id, item)
+        return index
+
+    def add(self, record_id: int, metadata: Dict):
+        """添加记录的属性"""
+        self._size = max(self._size, record_id + 1)
+        self._update(self.locations, "location", location_keys(metadata.get("location")), record_id, add=True)
+        self._update(self.tags, "tags", _terms(metadata.get("tags") or []), record_id, add=True)
+        rating = metadata.get("rating")
+        if isinstance(rating, (int, float)):
+            self.ratings[record_id] = float(rating)
+            self._sorted_ratings = None
+
+    def remove(self, record_id: int, metadata: Dict):
+        """删除记录的属性，metadata 为记录被删除前的元数据"""
+        self._update(self.locations, "location", location_keys(metadata.get("location")), record_id, add=False)
+        self._update(self.tags, "tags", _terms(metadata.get("tags") or []), record_id, add=False)
+        if self.ratings.pop(record_id, None) is not None:
+            self._sorted_ratings = None
+
+    def match(self, filter: Dict[str, Any]) -> Optional[np.ndarray]:
+        """满足过滤条件的记录位图（下标为 record_id），没有有效条件时返回 None"""
+        unknown = set(filter) - set(FILTER_KEYS)
+        if unknown:
+            raise ValueError(f"不支持的过滤条件: {sorted(unknown)}")
+
+        conditions: List[np.ndarray] = []
+        terms = _terms(filter.get("location"))
+        if terms:
+            conditions.append(self._any(("location", term) for term in terms if term in self.locations))
+        terms = _terms(filter.get("tags"))
+        if terms:
+            conditions.append(self._any(
+                ("tags", tag) for tag in self.tags if any(term in tag for term in terms)
+            ))
+        if filter.get("min_rating") is not None:
+            ratings, record_ids = self._rating_arrays()
+            start = np.searchsorted(ratings, float(filter["min_rating"]), side="left")
+            conditions.append(self._mask([record_ids[start:]]))
+
+        if not conditions:
+            return None
+        mask = conditions[0]
+        for condition in conditions[1:]:
+            mask &= condition
+        return mask
+
+    def _any(self, keys: Iterable[Tuple[str, str]]) -> np.ndarray:
+        """任一键对应的记录"""
+        return self._mask(self._array(*key) for key in keys)
+
+    def _mask(self, arrays: Iterable[np.ndarray]) -> np.ndarray:
+        mask = np.zeros(self._size, dtype=bool)
+        for record_ids in arrays:
+            mask[record_ids] = True
+        return mask
+
+    def _array(self, name: str, key: str) -> np.ndarray:
+        cached = self._arrays.get((name, key))
+        if cached is None:
+            record_ids = (self.locations if name == "location" else self.tags)[key]
+            cached = np.fromiter(record_ids, dtype=np.int64, count=len(record_ids))
+            self._arrays[(name, key)] = cached
+        return cached
+
+    def _update(self, lists: Dict[str, Set[int]], name: str, keys: Iterable[str], record_id: int, add: bool):
+        for key in keys:
+            self._arrays.pop((name, key), None)
+            if add:
+                lists[key].add(record_id)
+                continue
+            record_ids = lists.get(key)
+            if record_ids is None:
+                continue
+            record_ids.discard(record_id)
+            if not record_ids:
+                del lists[key]
+
+    def _rating_arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        if self._sorted_ratings is None:
+            record_ids = np.fromiter(self.ratings.keys(), dtype=np.int64, count=len(self.ratings))
+            ratings = np.fromiter(self.ratings.values(), dtype=np.float64, count=len(self.ratings))
+            order = np.argsort(ratings, kind="stable")
+            self._sorted_ratings = (ratings[order], record_ids[order])
+        return self._sorted_ratings
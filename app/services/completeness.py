@@ -0,0 +1,105 @@
+from app.services.intent_parser import parse_intent
+from typing import Any, Dict, List, Optional, Pattern, Tuple
+import re
+
+# 回答要点：(识别用户是否询问该要点的模式, 判断回答是否覆盖该要点的模式)
+SLOT_PATTERNS: Dict[str, Tuple[Pattern, Pattern]] = {
+    "price": (
+        re.compile(r"门票|票价|价格|多少钱|费用|花费|预算"),
+        re.compile(r"\d+\s*(元|块)|¥|￥|免费|免票|票价|门票.{0,6}\d"),
+    ),
+    "opening_hours": (
+        re.compile(r"开放时间|营业时间|几点|开门|关门|闭馆"),
+        re.compile(r"\d{1,2}\s*[:：点]\s*\d{0,2}|开放时间|营业时间|全天开放|闭馆"),
+    ),
+    "transport": (
+        re.compile(r"交通|怎么去|怎么走|地铁|公交|自驾|打车"),
+        re.compile(r"地铁|公交|自驾|打车|出租车|步行|乘坐|高铁|火车|机场|停车"),
+    ),
+    "duration": (
+        re.compile(r"几天|多久|游玩时间|游览时间|天行程"),
+        re.compile(r"\d+\s*(天|日|小时|个小时)|[一二三四五六七八九十两半]+\s*(天|日|小时|个小时)"),
+    ),
+    "route": (
+        re.compile(r"路线|行程|顺序|怎么安排"),
+        re.compile(r"路线|第[一二三四五六七八九十\d]+[站天]|→|->|上午|下午|然后|接着|最后"),
+    ),
+    "best_time": (
+        re.compile(r"最佳旅行时间|什么时候去|哪个季节|几月"),
+        re.compile(r"\d{1,2}\s*月|[一二三四五六七八九十]+月|春|夏|秋|冬|旺季|淡季"),
+    ),
+    "tips": (
+        re.compile(r"注意事项|贴士|须知"),
+        re.compile(r"注意|建议|避免|提前|记得|务必"),
+    ),
+    "customs": (
+        re.compile(r"习俗|禁忌|风俗"),
+        re.compile(r"习俗|禁忌|风俗|尊重|礼仪"),
+    ),
+}
+
+# 回答中表明无法回答的措辞
+_REFUSAL_PATTERN = re.compile(r"抱歉|无法提供|无法回答|不清楚|没有相关信息")
+
+MIN_ANSWER_CHARS = 80  # 没有明确要点时，回答的最小长度
+REFUSAL_SCORE_CAP = 0.5  # 回答中有拒答措辞时的最高得分
+
+def requested_slots(request: str) -> List[str]:
+    """识别请求中询问的要点"""
+    return [slot for slot, (asked, _) in SLOT_PATTERNS.items() if asked.search(request)]
+
+def score_completeness(request: str, answer: str) -> Tuple[float, List[str]]:
+    """本地估计回答的完整度
+
+    Args:
+        request: 用户需求（对话摘要和工具提示词）
+        answer: 模型回答
+
+    Returns:
+        (score, missing): 0~1 的完整度评分，以及回答未覆盖的要点
+    """
+    answer = answer or ""
+    slots = requested_slots(request)
+    if slots:
+        missing = [slot for slot in slots if not SLOT_PATTERNS[slot][1].search(answer)]
+        score = (len(slots) - len(missing)) / len(slots)
+    else:
+        missing = []
+        score = min(1.0, len(answer.strip()) / MIN_ANSWER_CHARS)
+
+    if _REFUSAL_PATTERN.search(answer):
+        score = min(score, REFUSAL_SCORE_CAP)
+    return score, missing
+
+# 回答与自评合并输出时，自评部分前的标记
+SELF_ASSESSMENT_MARKER = "【回答自评】"
+
+SELF_ASSESSMENT_PROMPT = f"""
+回答完成后，另起一行输出"{SELF_ASSESSMENT_MARKER}"，然后输出一个JSON对象评估上面的回答是否完整满足用户需求：
+{{"complete": true 或 false, "missing": ["未覆盖的要点"], "followup": "需要补充时的追问内容，完整时为空"}}
+自评部分不会展示给用户，回答正文中不要提及自评。
+"""
+
+# 没有标记时，回答末尾包含 complete 字段的 JSON 代码块也视为自评
+_TRAILING_VERDICT = re.compile(r"```(?:json)?\s*(\{[^`]*\"complete\"[^`]*\})\s*```\s*$", re.DOTALL)
+
+def split_self_assessment(text: str) -> Tuple[str, Optional[Dict[str, Any]]]:
+    """从回答中分离自评结果
+
+    Returns:
+        (answer, verdict): 去掉自评部分的回答，以及解析出的自评（没有或无法解析时为 None）
+    """
+    text = text or ""
+    index = text.rfind(SELF_ASSESSMENT_MARKER)
+    if index >= 0:
+        answer, verdict_text = text[:index], text[index + len(SELF_ASSESSMENT_MARKER):]
+    else:
+        match = _TRAILING_VERDICT.search(text)
+        if not match:
+            return text, None
+        answer, verdict_text = text[:match.start()], match.group(1)
+
+    verdict = parse_intent(verdict_text)
+    if verdict is not None and "complete" not in verdict:
+        verdict = None
+    return answer.rstrip(), verdict
@@ -0,0 +1,192 @@
+from app.core.config import settings
+from app.core.logger import logger
+from app.db.session import Session
+from app.db.models import ChatHistory
+from app.services.record_writer import record_writer
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List, Optional, Tuple
+from weakref import WeakValueDictionary
+import asyncio
+import time
+
+SYSTEM_PROMPT = "你是一个专业资深的出行推荐官，能够更加用户需求给出精准的出行推荐"
+
+# 服务内部写入 ChatHistory 的记录使用带该前缀的会话ID，客户端不能使用，避免读取到其他用户的数据
+INTERNAL_SESSION_PREFIX = "__internal__:"
+TOOL_EXECUTION_SESSION_ID = INTERNAL_SESSION_PREFIX + "tool_execution"  # 工具执行记录
+# 早期版本以不带前缀的会话ID写入的内部记录
+LEGACY_INTERNAL_SESSION_IDS = {"tool_execution"}
+
+def is_reserved_session_id(session_id: str) -> bool:
+    """会话ID是否为内部保留ID"""
+    return session_id.startswith(INTERNAL_SESSION_PREFIX) or session_id in LEGACY_INTERNAL_SESSION_IDS
+
+class ConversationSession:
+    """单个会话的对话状态"""
+
+    def __init__(self, max_turns: int):
+        self.turns: Deque[Tuple[str, str]] = deque(maxlen=max_turns)  # (用户输入, 助手回复)
+        self.size = 0  # 对话内容占用的字节数
+        self.summary = ""  # 滚动对话摘要
+        self.last_active = time.monotonic()
+
+    def add_turn(self, user: str, assistant: str):
+        if len(self.turns) == self.turns.maxlen:
+            self.size -= _turn_size(self.turns[0])
+        self.turns.append((user, assistant))
+        self.size += _turn_size((user, assistant))
+
+    def touch(self):
+        self.last_active = time.monotonic()
+
+def _turn_size(turn: Tuple[str, str]) -> int:
+    return sum(len(text.encode("utf-8")) for text in turn)
+
+class ConversationStore:
+    """会话存储（进程内）
+
+    每个会话只保留最近 max_turns 轮对话；会话按最近使用顺序淘汰，
+    超过 max_sessions 个会话、总内容超过 max_bytes 或空闲超过 idle_ttl 秒的会话会被移除。
+    """
+
+    def __init__(
+        self,
+        max_turns: int = 20,
+        max_sessions: int = 10000,
+        max_bytes: int = 64 * 1024 * 1024,
+        idle_ttl: Optional[float] = 3600
+    ):
+        self.max_turns = max_turns
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.idle_ttl = idle_ttl
+        self._sessions: "OrderedDict[str, ConversationSession]" = OrderedDict()
+        self._bytes = 0
+        self._locks: "WeakValueDictionary[str, asyncio.Lock]" = WeakValueDictionary()
+
+    def lock(self, session_id: str) -> asyncio.Lock:
+        """获取会话锁，保证同一会话的请求按顺序处理"""
+        lock = self._locks.get(session_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks[session_id] = lock
+        return lock
+
+    async def get_messages(self, session_id: str) -> List[Dict[str, str]]:
+        """获取会话的对话历史（包含系统提示词）"""
+        session = await self._load_session(session_id)
+        messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+        for user, assistant in session.turns:
+            messages.append({"role": "user", "content": user})
+            messages.append({"role": "assistant", "content": assistant})
+        return messages
+
+    async def add_turn(self, session_id: str, user: str, assistant: str):
+        """记录一轮对话"""
+        session = await self._load_session(session_id)
+        old_size = session.size
+        session.add_turn(user, assistant)
+        self._bytes += session.size - old_size
+        self._evict()
+
+    async def get_summary(self, session_id: str) -> str:
+        """获取会话的滚动摘要"""
+        session = await self._load_session(session_id)
+        return session.summary
+
+    async def set_summary(self, session_id: str, summary: str):
+        """更新会话的滚动摘要"""
+        session = await self._load_session(session_id)
+        size = len(summary.encode("utf-8")) - len(session.summary.encode("utf-8"))
+        session.summary = summary
+        session.size += size
+        self._bytes += size
+        self._evict()
+
+    async def has_turns(self, session_id: str) -> bool:
+        """会话中是否已有对话记录"""
+        session = await self._load_session(session_id)
+        return bool(session.turns)
+
+    def clear(self, session_id: str):
+        """删除会话"""
+        session = self._sessions.pop(session_id, None)
+        if session is not None:
+            self._bytes -= session.size
+
+    def stats(self) -> Dict[str, int]:
+        return {"sessions": len(self._sessions), "bytes": self._bytes}
+
+    async def _load_session(self, session_id: str) -> ConversationSession:
+        session = self._sessions.get(session_id)
+        if session is not None and self._expired(session):
+            self.clear(session_id)
+            session = None
+        if session is None:
+            session = ConversationSession(self.max_turns)
+            for user, assistant in await self._restore_turns(session_id):
+                session.add_turn(user, assistant)
+            self._sessions[session_id] = session
+            self._bytes += session.size
+        self._sessions.move_to_end(session_id)
+        session.touch()
+        return session
+
+    async def _restore_turns(self, session_id: str) -> List[Tuple[str, str]]:
+        """从持久化存储恢复会话，进程内存储没有持久化数据"""
+        return []
+
+    def _expired(self, session: ConversationSession) -> bool:
+        return bool(self.idle_ttl) and time.monotonic() - session.last_active > self.idle_ttl
+
+    def _evict(self):
+        """按 LRU 顺序淘汰会话，直到满足数量和内存限制"""
+        while self._sessions:
+            oldest_id, oldest = next(iter(self._sessions.items()))
+            if (
+                len(self._sessions) > self.max_sessions
+                or (self.max_bytes and self._bytes > self.max_bytes)
+                or self._expired(oldest)
+            ):
+                self.clear(oldest_id)
+                logger.debug(f"淘汰会话: {oldest_id}")
+            else:
+                break
+
+class DatabaseConversationStore(ConversationStore):
+    """基于 ChatHistory 表持久化的会话存储，内存中仍按相同规则缓存活跃会话"""
+
+    async def add_turn(self, session_id: str, user: str, assistant: str):
+        await super().add_turn(session_id, user, assistant)
+        await record_writer.submit(session_id=session_id, user_query=user, assistant_response=assistant)
+
+    async def _restore_turns(self, session_id: str) -> List[Tuple[str, str]]:
+        return await asyncio.to_thread(self._query_turns, session_id)
+
+    def _query_turns(self, session_id: str) -> List[Tuple[str, str]]:
+        try:
+            with Session() as session:
+                rows = session.query(ChatHistory).filter(
+                    ChatHistory.session_id == session_id
+                ).order_by(ChatHistory.id.desc()).limit(self.max_turns).all()
+                return [(row.user_query or "", row.assistant_response or "") for row in reversed(rows)]
+        except Exception as e:
+            logger.error(f"加载对话历史失败: {str(e)}")
+            return []
+
+def create_conversation_store() -> ConversationStore:
+    """根据配置创建会话存储"""
+    store_cls = {
+        "memory": ConversationStore,
+        "database": DatabaseConversationStore
+    }.get(settings.CONVERSATION_BACKEND)
+    if store_cls is None:
+        raise ValueError(f"未知的会话存储类型: {settings.CONVERSATION_BACKEND}")
+    return store_cls(
+        max_turns=settings.CONVERSATION_MAX_TURNS,
+        max_sessions=settings.CONVERSATION_MAX_SESSIONS,
+        max_bytes=settings.CONVERSATION_MAX_BYTES,
+        idle_ttl=settings.CONVERSATION_IDLE_TTL
+    )
+
+conversation_store = create_conversation_store()
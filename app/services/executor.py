@@ -1,11 +1,17 @@
-from typing import Dict, List, Any, Union
+from typing import AsyncIterator, Dict, List, Any, Optional, Union
+from app.core.config import settings
 from app.core.logger import logger
+from app.core import metrics
+from app.core import deadline
 from app.core.tools import tool_registry
 from app.services.tools import tool_funcs
 from app.services.tool_logger import tool_logger
-from app.db.session import Session
-from app.db.models import ChatHistory
-import json
+from app.services.streaming import is_streaming, emit_event, next_answer_id
+from app.services.record_writer import record_writer
+from app.services.conversation_store import TOOL_EXECUTION_SESSION_ID
+from app.services.tool_cache import tool_cache
+from app.services.intent_parser import IncrementalIntentParser, parse_intent
+import asyncio
 from enum import Enum
 
 class ActionType(str, Enum):
@@ -37,18 +43,48 @@ class ToolExecutor:
             if optimized_content:
                 parameters["summary"] = optimized_content
                 
+            # 命中工具结果缓存时直接返回
+            cache_key = tool_cache.make_key(func_name, parameters) if tool_cache is not None else None
+            if cache_key is not None:
+                cached = tool_cache.get(cache_key)
+                if cached is not None:
+                    logger.info(f"工具结果缓存命中: {func_name}")
+                    emit_event("stage", stage="tool", name=func_name, status="cached")
+                    if is_streaming():
+                        answer_id = next_answer_id()
+                        emit_event("answer_start", id=answer_id)
+                        emit_event("token", id=answer_id, content=cached)
+                        emit_event("answer_end", id=answer_id)
+                    return cached
+
             logger.info(f"执行工具函数: {func_name}, 参数: {parameters}")
-            result = await tool_func(**parameters)
+            emit_event("stage", stage="tool", name=func_name, status="start")
+            try:
+                # 工具预算作为嵌套截止时间，工具内的大模型调用先到期并返回部分结果；
+                # 外层等待多留宽限时间，只作为兜底
+                with metrics.tool_timer(func_name), deadline.scope(deadline.budget("tool")), \
+                        deadline.track_partial() as partial:
+                    result = await deadline.run(tool_func(**parameters), grace=deadline.GRACE_PERIOD)
+            except deadline.DeadlineExceeded as e:
+                logger.warning(f"工具函数执行超时: {func_name}, {str(e)}")
+                emit_event("stage", stage="tool", name=func_name, status="timeout")
+                return None
+            emit_event("stage", stage="tool", name=func_name, status="end")
+
+            if cache_key is not None and result:
+                # 超时后的部分回答或降级结果只返回给本次请求，不缓存
+                if partial or deadline.expired():
+                    logger.info(f"工具结果不完整，不缓存: {func_name}, {partial}")
+                else:
+                    tool_cache.set(func_name, cache_key, result)
             
-            # 保存执行记录
-            with Session() as session:
-                history = ChatHistory(
-                    session_id="tool_execution",  # 使用固定的会话ID标识工具执行
+            # 保存执行记录（放入批量写入队列，由后台任务落库）
+            with metrics.stage("tool_record_write"):
+                await record_writer.submit(
+                    session_id=TOOL_EXECUTION_SESSION_ID,  # 使用内部保留的会话ID标识工具执行
                     user_query="",  # 工具执行不需要用户查询
                     assistant_response=f"工具 {func_name} 执行结果: {result}"  # 将结果存储在助手回复字段
                 )
-                session.add(history)
-                session.commit()
                 
             return result
             
@@ -57,13 +93,84 @@ class ToolExecutor:
             return None
             
     @staticmethod
-    async def execute_multi_functions(functions: List[Dict], optimized_content: str = "") -> List[Any]:
-        """执行多个工具函数"""
-        results = []
+    async def execute_multi_functions(
+        functions: List[Dict],
+        optimized_content: str = "",
+        max_concurrency: Optional[int] = None
+    ) -> List[Any]:
+        """执行多个工具函数：相互独立的工具并发执行，结果按输入顺序返回"""
+        runner = ToolPlanRunner(optimized_content, max_concurrency)
         for func_info in functions:
-            result = await ToolExecutor.execute_single_function(func_info, optimized_content)
-            results.append(result)
-        return results
+            runner.submit(func_info)
+        return await runner.results()
+
+class ToolPlanRunner:
+    """按依赖关系并发执行多工具调用计划
+
+    每个工具可以通过 dependsOn 声明依赖前面的工具（下标从 0 开始，或工具名称），
+    被依赖工具的结果会追加到该工具的 summary 中；没有依赖的工具在并发上限内同时执行。
+    依赖只能指向更早提交的工具，因此不会出现环。
+    """
+
+    def __init__(self, optimized_content: str = "", max_concurrency: Optional[int] = None):
+        self.optimized_content = optimized_content
+        self._semaphore = asyncio.Semaphore(max_concurrency or settings.TOOL_MAX_CONCURRENCY)
+        self._tasks: List[asyncio.Task] = []
+        self._names: List[str] = []
+
+    def submit(self, function_info: Dict) -> int:
+        """提交一个工具调用，立即开始调度，返回其下标"""
+        index = len(self._tasks)
+        dependencies = self._resolve_dependencies(function_info, index)
+        self._names.append(function_info.get("funcName", ""))
+        self._tasks.append(asyncio.create_task(self._run(function_info, dependencies)))
+        return index
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    async def results(self) -> List[Any]:
+        """等待所有已提交的工具执行完成，按提交顺序返回结果"""
+        return list(await asyncio.gather(*self._tasks))
+
+    def cancel(self):
+        """取消尚未完成的工具调用"""
+        for task in self._tasks:
+            if not task.done():
+                task.cancel()
+
+    def _resolve_dependencies(self, function_info: Dict, index: int) -> List[int]:
+        declared = function_info.get("dependsOn") or []
+        if not isinstance(declared, list):
+            declared = [declared]
+
+        dependencies = []
+        for dependency in declared:
+            if isinstance(dependency, str) and dependency.isdigit():
+                dependency = int(dependency)
+            if isinstance(dependency, int):
+                position = dependency
+            else:
+                # 按工具名称匹配最近一次提交的同名工具
+                position = next((i for i in range(index - 1, -1, -1) if self._names[i] == dependency), -1)
+            if 0 <= position < index:
+                dependencies.append(position)
+            else:
+                logger.warning(f"忽略无效的工具依赖: {function_info.get('funcName')} -> {dependency}")
+        return sorted(set(dependencies))
+
+    async def _run(self, function_info: Dict, dependencies: List[int]) -> Any:
+        summary = self.optimized_content
+        if dependencies:
+            upstream = await asyncio.gather(*[self._tasks[i] for i in dependencies])
+            upstream_text = "\n".join(
+                f"{self._names[i]} 结果：{result}" for i, result in zip(dependencies, upstream) if result
+            )
+            if upstream_text:
+                summary = f"{summary}\n\n前序工具结果：\n{upstream_text}" if summary else f"前序工具结果：\n{upstream_text}"
+
+        async with self._semaphore:
+            return await ToolExecutor.execute_single_function(function_info, summary)
 
 # async def execute_single_function(func_name: str, params: Dict[str, Any], summary: str) -> str:
 #     """执行单一功能"""
@@ -92,15 +199,26 @@ class ToolExecutor:
     
 #     return "\n".join(results)
 
+TIMEOUT_MESSAGE = "请求处理超时，请稍后重试"
+
+async def _fallback(query: str) -> str:
+    """使用通用工具回答，已到截止时间时直接返回超时提示"""
+    if deadline.expired():
+        return TIMEOUT_MESSAGE
+    return await tool_registry.get_tool("general_tool")(query=query)
+
 async def execute_tool(response: str, optimized_content: str = "", query: str = "") -> str:
-    """执行工具调用"""
+    """执行工具调用
+
+    各工具在自身预算和请求剩余时间内执行，超时的工具被取消，
+    多工具调用时返回已完成工具的部分结果
+    """
     try:
-        # 解析模型返回的JSON
-        try:
-            function_call = json.loads(response)
-        except json.JSONDecodeError:
+        # 解析模型返回的JSON（格式不规范时先修复）
+        function_call = parse_intent(response)
+        if function_call is None:
             logger.error(f"JSON解析失败: {response}")
-            return await tool_registry.get_tool("general_tool")(query=query)
+            return await _fallback(query)
         
         # 根据actionType执行不同的调用逻辑
         action_type = function_call.get("actionType", "")
@@ -108,22 +226,96 @@ async def execute_tool(response: str, optimized_content: str = "", query: str =
         
         if not functions:
             logger.error("未找到要执行的工具函数")
-            return await tool_registry.get_tool("general_tool")(query=query)
+            return await _fallback(query)
             
         if action_type == "singleFunction":
             result = await ToolExecutor.execute_single_function(functions[0], optimized_content)
+            if not result and deadline.expired():
+                return TIMEOUT_MESSAGE
             return str(result) if result else "工具执行失败"
             
         elif action_type == "multiFunction":
             results = await ToolExecutor.execute_multi_functions(functions, optimized_content)
             # 合并多个工具的执行结果
             combined_result = "\n".join([str(r) for r in results if r])
+            if not combined_result and deadline.expired():
+                return TIMEOUT_MESSAGE
             return combined_result if combined_result else "工具执行失败"
             
         else:
             logger.error(f"未知的actionType: {action_type}")
-            return await tool_registry.get_tool("general_tool")(query=query)
+            return await _fallback(query)
             
     except Exception as e:
         logger.error(f"工具执行失败: {str(e)}")
-        return await tool_registry.get_tool("general_tool")(query=query) 
\ No newline at end of file
+        return await _fallback(query)
+
+async def execute_tool_stream(chunks: AsyncIterator[str], optimized_content: str = "", query: str = "") -> str:
+    """边接收意图识别的流式输出边执行工具
+
+    functions 中的每个功能一旦完整就提交执行，不必等待整个意图 JSON 生成完毕；
+    actionType 尚未解析出来时只先执行第一个功能，其余功能等确定调用方式后再执行。
+    流式解析没有得到任何功能时，使用整体修复后的解析结果，仍失败才回退到通用工具；
+    actionType 未知时与 execute_tool 一样回退到通用工具
+    """
+    parser = IncrementalIntentParser()
+    runner = ToolPlanRunner(optimized_content)
+    pending: List[Dict] = []  # 等待确定 actionType 后再执行的功能
+
+    def submit(function_info: Optional[Dict] = None):
+        if function_info is not None:
+            pending.append(function_info)
+        while pending:
+            action_type = parser.action_type
+            if action_type is None and len(runner):
+                return
+            function_info = pending.pop(0)
+            # 单功能调用只执行第一个功能，未知的 actionType 不执行
+            if action_type == ActionType.single and len(runner):
+                continue
+            if action_type is not None and action_type not in (ActionType.single, ActionType.multi):
+                continue
+            logger.info(f"意图解析得到工具调用: {function_info.get('funcName')}")
+            runner.submit(function_info)
+
+    async def consume():
+        with metrics.stage("intent"):
+            async for chunk in chunks:
+                for function_info in parser.feed(chunk):
+                    submit(function_info)
+                submit()
+
+    try:
+        try:
+            await deadline.run(consume(), "intent")
+        except deadline.DeadlineExceeded as e:
+            logger.warning(f"意图识别超时: {str(e)}")
+
+        function_call = {}
+        if parser.action_type is None or not len(runner):
+            function_call = parser.close() or {}
+            parser.action_type = parser.action_type or function_call.get("actionType", "")
+        if not len(runner) and not function_call.get("functions"):
+            logger.error("意图解析失败，未找到要执行的工具函数")
+            return await _fallback(query)
+        if parser.action_type not in (ActionType.single, ActionType.multi):
+            runner.cancel()
+            logger.error(f"未知的actionType: {parser.action_type}")
+            return await _fallback(query)
+
+        if len(runner):
+            submit()
+        else:
+            for function_info in function_call["functions"]:
+                submit(function_info)
+
+        results = await runner.results()
+        combined_result = "\n".join([str(r) for r in results if r])
+        if not combined_result and deadline.expired():
+            return TIMEOUT_MESSAGE
+        return combined_result if combined_result else "工具执行失败"
+
+    except Exception as e:
+        runner.cancel()
+        logger.error(f"工具执行失败: {str(e)}")
+        return await _fallback(query)
@@ -0,0 +1,208 @@
+from app.core.config import settings
+from app.core.logger import logger
+from typing import Any, Dict, Iterable, Optional, Tuple
+import faiss
+import json
+import math
+import numpy as np
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+
+# 索引参数默认值，可在 VECTOR_INDEX_DEFAULT 和 VECTOR_INDEX_CONFIGS 中覆盖
+DEFAULT_INDEX_PARAMS: Dict[str, Any] = {
+    "type": "flat",  # flat / ivf_flat / ivf_pq / hnsw
+    "train_threshold": 10000,  # 记录数达到该值后才构建近似索引，之前使用精确的 Flat 索引
+    "nlist": 0,  # IVF 聚类中心数，0 表示按 4*sqrt(记录数) 自动确定
+    "nprobe": 16,  # IVF 检索时访问的聚类数
+    "pq_m": 48,  # PQ 子向量数，需整除向量维度
+    "pq_nbits": 8,  # 每个子向量的编码位数
+    "hnsw_m": 32,  # HNSW 每个节点的邻居数
+    "ef_construction": 40,  # HNSW 构建时的候选数
+    "ef_search": 64,  # HNSW 检索时的候选数
+    "max_train_points": 100000,  # 训练时最多使用的样本数
+    "max_tombstone_ratio": 0.2,  # HNSW 中已删除向量的占比超过该值时重建索引
+    "exact_filter_limit": 2000,  # 过滤后的记录数不超过该值时直接精确计算距离
+}
+
+# 每个聚类中心至少需要的训练样本数（FAISS 聚类的建议值）
+MIN_POINTS_PER_CENTROID = 39
+
+def _base_index(index: faiss.Index) -> faiss.Index:
+    """IndexIDMap 包装的底层索引"""
+    if isinstance(index, faiss.IndexIDMap):
+        return faiss.downcast_index(index.index)
+    return index
+
+def index_type(index: faiss.Index) -> str:
+    """索引的类型名称"""
+    if isinstance(_base_index(index), faiss.IndexHNSW):
+        return "hnsw"
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        return "ivf_pq" if isinstance(faiss.downcast_index(ivf), faiss.IndexIVFPQ) else "ivf_flat"
+    return "flat"
+
+def uses_tombstones(index: faiss.Index) -> bool:
+    """HNSW 不支持删除向量，删除时只把 ID 标记为 -1（墓碑），检索结果中跳过"""
+    return index_type(index) == "hnsw"
+
+def _id_map(index: faiss.Index) -> np.ndarray:
+    """IndexIDMap 中按位置排列的 record_id（可写视图）"""
+    return faiss.rev_swig_ptr(index.id_map.data(), index.id_map.size())
+
+def tombstone_count(index: faiss.Index) -> int:
+    """已标记删除、但仍占用索引位置的向量数"""
+    if not uses_tombstones(index) or index.ntotal == 0:
+        return 0
+    return int(np.count_nonzero(_id_map(index) < 0))
+
+def remove_ids(index: faiss.Index, ids: Iterable[int]) -> int:
+    """从索引中删除 record_id 对应的向量，返回删除的数量
+
+    Flat 和 IVF 直接删除；HNSW 把对应位置的 ID 标记为 -1，只修改被删除的位置。
+    """
+    ids = np.asarray(list(ids), dtype=np.int64)
+    if not len(ids) or index.ntotal == 0:
+        return 0
+    if uses_tombstones(index):
+        labels = _id_map(index)
+        positions = np.flatnonzero(np.isin(labels, ids))
+        labels[positions] = -1
+        return len(positions)
+    return index.remove_ids(faiss.IDSelectorBatch(ids))
+
+def live_vectors(index: faiss.Index) -> Tuple[np.ndarray, np.ndarray]:
+    """取出 Flat / HNSW 索引中未删除的向量及其 record_id，用于切换索引类型或清理墓碑"""
+    if not isinstance(index, faiss.IndexIDMap):
+        raise ValueError(f"不支持从 {index_type(index)} 索引中取出向量")
+    labels = faiss.vector_to_array(index.id_map)
+    vectors = _base_index(index).reconstruct_n(0, index.ntotal)
+    live = labels >= 0
+    return vectors[live], labels[live]
+
+def id_selector(mask: np.ndarray) -> faiss.IDSelector:
+    """由 record_id 位图（布尔数组）构造 FAISS ID 选择器"""
+    bitmap = np.packbits(mask, bitorder="little")
+    selector = faiss.IDSelectorBitmap(len(mask), faiss.swig_ptr(bitmap))
+    selector.referenced_objects = [bitmap]  # 选择器只保存指针，位图需与选择器同生命周期
+    return selector
+
+def exact_search(index: faiss.Index, query_vectors: np.ndarray, k: int, mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """只在位图 mask 中的记录内精确检索，返回 (距离, record_id)
+
+    Flat / HNSW 按 ID 取出向量直接计算距离；IVF 访问全部聚类并用 ID 选择器过滤。
+    """
+    if isinstance(index, faiss.IndexIDMap2):
+        ids = np.flatnonzero(mask)
+        D, positions = faiss.knn(query_vectors, index.reconstruct_batch(ids), k)
+        return D, np.where(positions >= 0, ids[positions], -1)
+    ivf = faiss.extract_index_ivf(index)
+    params = faiss.SearchParametersIVF(nprobe=ivf.nlist, sel=id_selector(mask))
+    return index.search(query_vectors, k, params=params)
+
+class IndexConfig:
+    """集合的 FAISS 索引配置
+
+    记录数未达到 train_threshold 时始终使用 Flat 索引；达到后按配置的类型训练并构建近似索引。
+    nprobe / ef_search 为检索时的默认参数，每次检索可单独指定。
+    索引中的 ID 即 record_id：Flat 和 HNSW 由 IndexIDMap2 包装，IVF 直接保存 ID。
+    """
+
+    def __init__(self, **params):
+        unknown = set(params) - set(DEFAULT_INDEX_PARAMS)
+        if unknown:
+            raise ValueError(f"未知的向量索引参数: {sorted(unknown)}")
+        self.params = {**DEFAULT_INDEX_PARAMS, **params}
+        if self.params["type"] not in INDEX_TYPES:
+            raise ValueError(f"不支持的向量索引类型: {self.params['type']}")
+
+    @classmethod
+    def for_collection(cls, collection_name: str) -> "IndexConfig":
+        """集合的索引配置：默认配置叠加集合单独的配置"""
+        return cls(**{
+            **settings.VECTOR_INDEX_DEFAULT,
+            **settings.VECTOR_INDEX_CONFIGS.get(collection_name, {})
+        })
+
+    @property
+    def type(self) -> str:
+        return self.params["type"]
+
+    def signature(self) -> str:
+        """配置的签名，配置变化时快照随之失效"""
+        return json.dumps(self.params, sort_keys=True)
+
+    def target_type(self, count: int) -> str:
+        """count 条记录时应使用的索引类型"""
+        if self.type == "flat" or count < self.params["train_threshold"]:
+            return "flat"
+        return self.type
+
+    def needs_training(self, index: faiss.Index) -> bool:
+        """当前是 Flat 索引，但记录数已达到构建近似索引的阈值"""
+        return index_type(index) == "flat" and self.target_type(index.ntotal) != "flat"
+
+    def needs_compaction(self, index: faiss.Index, tombstones: int) -> bool:
+        """墓碑占比超过阈值，需要重建索引"""
+        return tombstones > 0 and tombstones > self.params["max_tombstone_ratio"] * index.ntotal
+
+    def build(self, dimension: int, vectors: np.ndarray, ids: np.ndarray) -> faiss.Index:
+        """按配置构建索引并以 ids 为 ID 添加 vectors（必要时先训练）"""
+        kind = self.target_type(len(vectors))
+        if kind == "flat":
+            index = faiss.IndexIDMap2(faiss.IndexFlatL2(dimension))
+        elif kind == "hnsw":
+            hnsw = faiss.IndexHNSWFlat(dimension, self.params["hnsw_m"])
+            hnsw.hnsw.efConstruction = self.params["ef_construction"]
+            hnsw.hnsw.efSearch = self.params["ef_search"]
+            index = faiss.IndexIDMap2(hnsw)
+        else:
+            nlist = self._nlist(len(vectors))
+            quantizer = faiss.IndexFlatL2(dimension)
+            if kind == "ivf_flat":
+                index = faiss.IndexIVFFlat(quantizer, dimension, nlist)
+            else:
+                index = faiss.IndexIVFPQ(
+                    quantizer, dimension, nlist, self.params["pq_m"], self.params["pq_nbits"]
+                )
+            index.nprobe = self.params["nprobe"]
+            index.train(self._training_sample(vectors))
+            logger.info(f"训练向量索引完成: {kind}, nlist={nlist}, 样本数={min(len(vectors), self.params['max_train_points'])}")
+
+        if len(vectors):
+            index.add_with_ids(vectors, np.asarray(ids, dtype=np.int64))
+        return index
+
+    def search_params(
+        self,
+        index: faiss.Index,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        mask: Optional[np.ndarray] = None
+    ) -> Optional[faiss.SearchParameters]:
+        """检索参数；以参数对象传入而不修改索引，并发检索可以使用不同的参数
+
+        mask 为 record_id 位图，不为空时只返回位图中的记录
+        """
+        selector = {"sel": id_selector(mask)} if mask is not None else {}
+        kind = index_type(index)
+        if kind == "hnsw":
+            return faiss.SearchParametersHNSW(efSearch=ef_search or self.params["ef_search"], **selector)
+        if kind in ("ivf_flat", "ivf_pq"):
+            return faiss.SearchParametersIVF(nprobe=nprobe or self.params["nprobe"], **selector)
+        return faiss.SearchParameters(**selector) if selector else None
+
+    def use_exact_filter(self, index: faiss.Index, matched: int) -> bool:
+        """过滤后的记录较少时直接精确计算，比带选择器的索引检索更快且结果完整"""
+        return isinstance(index, faiss.IndexIDMap2) and matched <= self.params["exact_filter_limit"]
+
+    def _nlist(self, count: int) -> int:
+        nlist = self.params["nlist"] or int(4 * math.sqrt(count))
+        return max(1, min(nlist, count // MIN_POINTS_PER_CENTROID))
+
+    def _training_sample(self, vectors: np.ndarray) -> np.ndarray:
+        limit = self.params["max_train_points"]
+        if len(vectors) <= limit:
+            return vectors
+        rows = np.random.default_rng(0).choice(len(vectors), limit, replace=False)
+        return vectors[np.sort(rows)]
@@ -0,0 +1,85 @@
+from app.core.logger import logger
+from app.services.index_factory import tombstone_count
+from typing import Dict, Optional, Tuple
+import faiss
+import json
+import os
+
+SNAPSHOT_VERSION = 2  # 快照格式版本，格式变化时递增以触发重建
+
+# 内存映射加载标志；IO_FLAG_MMAP_IFC 使 Flat 索引的向量数据也以映射方式加载（较新版本的 FAISS 支持）
+MMAP_FLAGS = faiss.IO_FLAG_MMAP | getattr(faiss, "IO_FLAG_MMAP_IFC", 0)
+
+class IndexSnapshotStore:
+    """FAISS 索引快照
+
+    每个集合保存两个文件：
+    - {collection}.faiss: FAISS 索引（以 record_id 为 ID）
+    - {collection}.meta.json: 格式版本、数据校验值和各 record_id 的元数据
+
+    加载时以内存映射方式读取索引，多个工作进程可以共享页缓存。
+    元数据文件最后写入，作为快照完整的标志；校验值与数据库不一致时视为过期。
+    """
+
+    def __init__(self, directory: str, mmap: bool = True):
+        self.directory = directory
+        self.mmap = mmap
+
+    def _paths(self, collection_name: str) -> Tuple[str, str]:
+        base = os.path.join(self.directory, collection_name)
+        return f"{base}.faiss", f"{base}.meta.json"
+
+    def save(self, collection_name: str, index: faiss.Index, metadata: Dict[int, Dict], checksum: str):
+        """保存索引和元数据，先写临时文件再替换，避免其他进程读到不完整的快照"""
+        os.makedirs(self.directory, exist_ok=True)
+        index_path, meta_path = self._paths(collection_name)
+        suffix = f".tmp{os.getpid()}"
+
+        faiss.write_index(index, index_path + suffix)
+        with open(meta_path + suffix, "w", encoding="utf-8") as f:
+            json.dump({
+                "version": SNAPSHOT_VERSION,
+                "checksum": checksum,
+                "count": len(metadata),
+                "metadata": list(metadata.items())
+            }, f, ensure_ascii=False)
+
+        # 元数据最后替换，加载时以它的校验值为准
+        os.replace(index_path + suffix, index_path)
+        os.replace(meta_path + suffix, meta_path)
+        logger.info(f"保存向量索引快照: {collection_name}, {len(metadata)} 条记录")
+
+    def _read_index(self, index_path: str) -> faiss.Index:
+        """读取索引文件；IVF 索引的倒排表不支持以 MMAP_FLAGS 映射，此时改为读入内存"""
+        if not self.mmap:
+            return faiss.read_index(index_path)
+        try:
+            return faiss.read_index(index_path, MMAP_FLAGS)
+        except RuntimeError:
+            return faiss.read_index(index_path)
+
+    def load(self, collection_name: str, checksum: str) -> Optional[Tuple[faiss.Index, Dict[int, Dict]]]:
+        """加载快照，不存在、版本不符或校验值与数据库不一致时返回 None"""
+        index_path, meta_path = self._paths(collection_name)
+        if not all(os.path.exists(path) for path in (index_path, meta_path)):
+            return None
+
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("version") != SNAPSHOT_VERSION or meta.get("checksum") != checksum:
+                logger.info(f"向量索引快照已过期: {collection_name}")
+                return None
+
+            index = self._read_index(index_path)
+            metadata = {record_id: item for record_id, item in meta["metadata"]}
+            if not (index.ntotal - tombstone_count(index) == len(metadata) == meta["count"]):
+                logger.warning(f"向量索引快照不完整: {collection_name}")
+                return None
+
+            logger.info(f"加载向量索引快照: {collection_name}, {len(metadata)} 条记录")
+            return index, metadata
+
+        except Exception as e:
+            logger.error(f"加载向量索引快照失败: {str(e)}")
+            return None
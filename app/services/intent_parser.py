@@ -0,0 +1,212 @@
+from app.core.logger import logger
+from typing import Any, Dict, List, Optional
+import json
+
+def repair_json(text: str) -> str:
+    """修复大模型输出中常见的 JSON 格式问题
+
+    - 去掉 JSON 前后的说明文字和 ``` 代码块标记
+    - 去掉 // 和 /* */ 注释
+    - 去掉对象和数组末尾多余的逗号
+    - 补全被截断的括号
+    """
+    output: List[str] = []
+    closers: List[str] = []
+    in_string = escape = False
+    i, length = 0, len(text)
+    while i < length:
+        ch = text[i]
+        if in_string:
+            output.append(ch)
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+            i += 1
+            continue
+
+        if ch == "/" and text.startswith("//", i):
+            end = text.find("\n", i)
+            i = length if end < 0 else end
+            continue
+        if ch == "/" and text.startswith("/*", i):
+            end = text.find("*/", i + 2)
+            i = length if end < 0 else end + 2
+            continue
+        if not closers and ch != "{":
+            # 最外层对象之外的内容（说明文字、代码块标记）全部忽略
+            i += 1
+            continue
+
+        if ch in "}]":
+            while output and output[-1] in " \t\r\n,":
+                output.pop()
+            if closers:
+                closers.pop()
+            output.append(ch)
+            if not closers:
+                break
+        else:
+            if ch == '"':
+                in_string = True
+            elif ch == "{":
+                closers.append("}")
+            elif ch == "[":
+                closers.append("]")
+            output.append(ch)
+        i += 1
+
+    if in_string:
+        output.append('"')
+    while closers:
+        while output and output[-1] in " \t\r\n,":
+            output.pop()
+        output.append(closers.pop())
+    return "".join(output)
+
+def parse_intent(text: str) -> Optional[Dict[str, Any]]:
+    """解析意图识别结果，格式不规范时先尝试修复，仍无法解析时返回 None"""
+    try:
+        result = json.loads(text)
+    except (json.JSONDecodeError, TypeError):
+        try:
+            result = json.loads(repair_json(text or ""))
+        except json.JSONDecodeError:
+            return None
+    return result if isinstance(result, dict) else None
+
+class IncrementalIntentParser:
+    """意图识别结果的增量解析器
+
+    逐段接收大模型流式输出，functions 数组中的每个功能一旦完整就立即返回，
+    调用方不必等待整个 JSON 生成完毕即可开始执行工具。
+    解析过程中会跳过注释和 JSON 之外的内容，单个功能的解析使用 repair_json 容错。
+    """
+
+    def __init__(self):
+        self.action_type: Optional[str] = None
+        self.functions: List[Dict[str, Any]] = []
+        self._raw: List[str] = []  # 原始输出，用于结束时的整体解析
+        self._text = ""  # 去除注释后的 JSON 文本
+        self._stack: List[str] = []
+        self._functions_depth: Optional[int] = None  # functions 数组所在的层级
+        self._function_start: Optional[int] = None
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._comment: Optional[str] = None  # "line" 或 "block"
+        self._pending_slash = False
+        self._pending_star = False
+        self._last_string: Optional[str] = None
+        self._key: Optional[str] = None
+        self._done = False
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """接收一段输出，返回本段中新完成的功能"""
+        self._raw.append(chunk)
+        completed: List[Dict[str, Any]] = []
+        for ch in chunk:
+            if self._done:
+                break
+            function = self._consume(ch)
+            if function is not None:
+                completed.append(function)
+        return completed
+
+    def close(self) -> Optional[Dict[str, Any]]:
+        """输出结束，返回整体解析（必要时修复）后的意图"""
+        return parse_intent("".join(self._raw))
+
+    def _consume(self, ch: str) -> Optional[Dict[str, Any]]:
+        if self._comment == "line":
+            if ch == "\n":
+                self._comment = None
+            return None
+        if self._comment == "block":
+            if self._pending_star and ch == "/":
+                self._comment = None
+            self._pending_star = ch == "*"
+            return None
+
+        if self._in_string:
+            self._text += ch
+            if self._escape:
+                self._escape = False
+            elif ch == "\\":
+                self._escape = True
+            elif ch == '"':
+                self._in_string = False
+                self._on_string(self._text[self._string_start:])
+            return None
+
+        if self._pending_slash:
+            self._pending_slash = False
+            if ch == "/":
+                self._comment = "line"
+                return None
+            if ch == "*":
+                self._comment = "block"
+                self._pending_star = False
+                return None
+        if ch == "/":
+            self._pending_slash = True
+            return None
+        if not self._stack and ch != "{":
+            return None
+
+        self._text += ch
+        if ch == '"':
+            self._in_string = True
+            self._string_start = len(self._text) - 1
+        elif ch == ":":
+            self._key = self._last_string
+        elif ch == ",":
+            self._key = None
+        elif ch in "{[":
+            if (
+                ch == "{"
+                and self._functions_depth is not None
+                and len(self._stack) == self._functions_depth
+            ):
+                self._function_start = len(self._text) - 1
+            if ch == "[" and len(self._stack) == 1 and self._key == "functions":
+                self._functions_depth = 2
+            self._stack.append(ch)
+            self._key = None
+        elif ch in "}]":
+            if self._stack:
+                self._stack.pop()
+            self._key = None
+            if not self._stack:
+                self._done = True
+            elif ch == "]" and len(self._stack) + 1 == self._functions_depth:
+                self._functions_depth = None
+            elif (
+                ch == "}"
+                and self._function_start is not None
+                and len(self._stack) == self._functions_depth
+            ):
+                return self._complete_function()
+        return None
+
+    def _on_string(self, literal: str):
+        try:
+            value = json.loads(literal)
+        except json.JSONDecodeError:
+            value = literal[1:-1]
+        if self._key is None:
+            self._last_string = value
+        elif self._key == "actionType" and len(self._stack) == 1:
+            self.action_type = value
+
+    def _complete_function(self) -> Optional[Dict[str, Any]]:
+        text = self._text[self._function_start:]
+        self._function_start = None
+        function = parse_intent(text)
+        if function is None:
+            logger.warning(f"无法解析功能调用: {text}")
+            return None
+        self.functions.append(function)
+        return function
@@ -0,0 +1,270 @@
+from app.core.config import settings
+from app.core.logger import logger
+from app.core.tools import FUNCTION_CALLING_TOOLS
+from app.db.session import Session
+from app.db.models import Spot
+from app.services.vector_store import vector_store
+from typing import Dict, Any, List, Optional, Tuple
+import numpy as np
+import re
+import threading
+
+# 各工具的标注示例语句
+INTENT_EXAMPLES: Dict[str, List[str]] = {
+    "search_spot_info": [
+        "故宫的门票多少钱",
+        "兵马俑几点开门",
+        "长城怎么去，交通方便吗",
+        "介绍一下大雁塔",
+        "颐和园的开放时间和票价",
+        "天坛需要提前预约吗",
+        "回民街在哪里，怎么坐地铁过去",
+    ],
+    "spot_recommend": [
+        "推荐一些适合秋天去的景点",
+        "三天时间有什么好玩的地方",
+        "想看自然风光，有什么推荐",
+        "适合带孩子去的景点有哪些",
+        "夏天去哪里玩比较好",
+        "推荐几个有历史文化的景点",
+        "周末两天有什么值得去的地方",
+    ],
+    "spot_route_recommend": [
+        "帮我规划一下故宫的游览路线",
+        "兵马俑怎么逛比较合理",
+        "一天时间怎么安排长城的行程",
+        "坐地铁游览天坛的路线",
+        "颐和园半天怎么玩",
+        "给我设计一条大雁塔的参观路线",
+    ],
+    "deep_search": [
+        "想深度体验当地文化",
+        "有什么地道的美食和特色活动",
+        "想了解当地的民俗和非遗",
+        "有没有小众的深度游玩法",
+        "想体验当地人的生活方式",
+        "帮我深入分析一下旅行需求",
+    ],
+    "add_required_spot": [
+        "把故宫加入必去景点",
+        "行程里一定要有兵马俑",
+        "长城是必选的，帮我加上",
+        "我一定要去大雁塔",
+        "把颐和园加到行程里",
+        "天坛必须安排上",
+    ],
+    "travel_tips": [
+        "去西安旅游要注意什么",
+        "北京旅行有什么建议",
+        "去西安穿什么衣服合适",
+        "北京什么时候去最好",
+        "当地有什么习俗需要注意",
+        "旅行需要准备哪些东西",
+    ],
+    "general_tool": [
+        "谢谢",
+        "你好",
+        "好的，知道了",
+        "你是谁",
+        "辛苦了",
+        "再见",
+    ],
+}
+
+SEASON_KEYWORDS = {
+    "春": "春季", "夏": "夏季", "秋": "秋季", "冬": "冬季",
+}
+MONTH_SEASONS = {
+    1: "冬季", 2: "冬季", 3: "春季", 4: "春季", 5: "春季", 6: "夏季",
+    7: "夏季", 8: "夏季", 9: "秋季", 10: "秋季", 11: "秋季", 12: "冬季",
+}
+PREFERENCE_KEYWORDS = ["历史", "文化", "自然", "美食", "购物", "亲子", "园林", "建筑", "宗教", "佛教", "艺术", "户外", "摄影"]
+FOCUS_KEYWORDS = ["文化体验", "美食", "特色活动", "民俗", "非遗", "夜生活", "购物", "小众", "历史", "艺术"]
+ASPECT_KEYWORDS = ["住宿", "交通", "天气", "美食", "安全", "穿衣", "习俗", "预算", "签证", "购物", "门票"]
+TRANSPORT_KEYWORDS = ["地铁", "公交", "自驾", "步行", "骑行", "打车", "高铁", "大巴"]
+SPOT_SUFFIX_PATTERN = re.compile(r"([一-龥]{1,8}?(?:景区|公园|博物馆|古城|古镇|寺|塔|山|湖|宫|园|街|城墙))")
+CHINESE_NUMBERS = {"一": 1, "二": 2, "两": 2, "三": 3, "四": 4, "五": 5, "六": 6, "七": 7, "八": 8, "九": 9, "十": 10}
+DAYS_PATTERN = re.compile(r"(\d+|[一二两三四五六七八九十]+)\s*(?:天|日)")
+TIME_BUDGET_PATTERN = re.compile(r"(半天|一天|\d+\s*(?:个)?小时|[一二两三四五六七八九十\d]+\s*天)")
+MONTH_PATTERN = re.compile(r"(\d{1,2})\s*月")
+DESTINATION_PATTERN = re.compile(r"(?:去|到|在)([一-龥]{2,4}?)(?:旅游|旅行|玩|游玩|出差|自由行)")
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+def _parse_chinese_number(text: str) -> Optional[int]:
+    if text.isdigit():
+        return int(text)
+    if text == "十":
+        return 10
+    if text.startswith("十"):
+        return 10 + CHINESE_NUMBERS.get(text[1:], 0)
+    if "十" in text:
+        tens, _, ones = text.partition("十")
+        return CHINESE_NUMBERS.get(tens, 1) * 10 + CHINESE_NUMBERS.get(ones, 0)
+    return CHINESE_NUMBERS.get(text)
+
+class IntentRouter:
+    """本地意图路由
+
+    用向量模型对用户输入编码，与各工具的标注示例做最近邻分类，并通过规则抽取参数。
+    置信度不足或缺少必填参数时返回 None，由调用方回退到大模型意图识别。
+    """
+
+    def __init__(self, threshold: float = 0.8, margin: float = 0.05):
+        """
+        Args:
+            threshold: 最高相似度需达到的阈值
+            margin: 最佳工具与次佳工具的相似度差距下限
+        """
+        self.threshold = threshold
+        self.margin = margin
+        self._labels: List[str] = []
+        self._example_vectors: Optional[np.ndarray] = None
+        self._spot_names: Optional[List[str]] = None
+        self._cities: List[str] = []
+        self._lock = threading.Lock()
+        self._required = {
+            tool["name_for_model"]: [p["name"] for p in tool.get("parameters", []) if p.get("required")]
+            for tool in FUNCTION_CALLING_TOOLS
+        }
+
+    def _ensure_examples(self):
+        with self._lock:
+            if self._example_vectors is not None:
+                return
+            texts = []
+            for tool_name, examples in INTENT_EXAMPLES.items():
+                texts.extend(examples)
+                self._labels.extend([tool_name] * len(examples))
+            self._example_vectors = _normalize(np.asarray(vector_store.model.encode(texts), dtype=np.float32))
+            logger.info(f"意图路由示例编码完成: {len(texts)} 条")
+
+    def refresh_vocabulary(self):
+        """从数据库加载景点名称和城市，用于参数抽取"""
+        try:
+            with Session() as session:
+                rows = session.query(Spot.name, Spot.location).all()
+            self._spot_names = sorted({name for name, _ in rows if name}, key=len, reverse=True)
+            cities = set()
+            for _, location in rows:
+                match = re.match(r"(.{2,4}?)市", location or "")
+                if match:
+                    cities.add(match.group(1))
+            self._cities = sorted(cities, key=len, reverse=True)
+        except Exception as e:
+            logger.error(f"加载意图路由词表失败: {str(e)}")
+            self._spot_names = []
+
+    def classify(self, query: str) -> Tuple[str, float, float]:
+        """返回 (最佳工具, 最高相似度, 与次佳工具的差距)"""
+        self._ensure_examples()
+        query_vector = _normalize(np.asarray(vector_store.get_embedding(query), dtype=np.float32))
+        similarities = self._example_vectors @ query_vector
+
+        scores: Dict[str, float] = {}
+        for label, similarity in zip(self._labels, similarities):
+            scores[label] = max(scores.get(label, -1.0), float(similarity))
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        best_tool, best_score = ranked[0]
+        second_score = ranked[1][1] if len(ranked) > 1 else -1.0
+        return best_tool, best_score, best_score - second_score
+
+    def extract_slots(self, tool_name: str, query: str) -> Dict[str, Any]:
+        """按规则从用户输入中抽取工具参数"""
+        if self._spot_names is None:
+            self.refresh_vocabulary()
+
+        spots = [name for name in self._spot_names if name in query]
+        if not spots:
+            spots = SPOT_SUFFIX_PATTERN.findall(query)
+
+        slots: Dict[str, Any] = {}
+        if tool_name == "search_spot_info":
+            if spots:
+                slots["spot_list"] = spots
+        elif tool_name == "spot_recommend":
+            season = self._extract_season(query)
+            if season:
+                slots["season"] = season
+            days = DAYS_PATTERN.search(query)
+            if days:
+                number = _parse_chinese_number(days.group(1))
+                if number:
+                    slots["days"] = str(number)
+            preference = [word for word in PREFERENCE_KEYWORDS if word in query]
+            if preference:
+                slots["preference"] = "、".join(preference)
+        elif tool_name == "spot_route_recommend":
+            if spots:
+                slots["spot_name"] = spots[0]
+            transport = next((word for word in TRANSPORT_KEYWORDS if word in query), None)
+            if transport:
+                slots["transport"] = transport
+            time_budget = TIME_BUDGET_PATTERN.search(query)
+            if time_budget:
+                slots["time_budget"] = time_budget.group(1)
+        elif tool_name == "deep_search":
+            focus = [word for word in FOCUS_KEYWORDS if word in query]
+            if focus:
+                slots["focus"] = "、".join(focus)
+        elif tool_name == "add_required_spot":
+            if spots:
+                slots["spot_name"] = spots[0]
+        elif tool_name == "travel_tips":
+            destination = next((city for city in self._cities if city in query), None)
+            if not destination:
+                match = DESTINATION_PATTERN.search(query)
+                destination = match.group(1) if match else (spots[0] if spots else None)
+            if destination:
+                slots["destination"] = destination
+            aspect = [word for word in ASPECT_KEYWORDS if word in query]
+            if aspect:
+                slots["aspect"] = "、".join(aspect)
+        elif tool_name == "general_tool":
+            slots["query"] = query
+        return slots
+
+    def route(self, query: str) -> Optional[Dict[str, Any]]:
+        """尝试本地路由，成功时返回与大模型意图识别相同格式的调用计划"""
+        try:
+            tool_name, score, margin = self.classify(query)
+        except Exception as e:
+            logger.error(f"本地意图路由失败: {str(e)}")
+            return None
+
+        if score < self.threshold or margin < self.margin:
+            logger.info(f"本地意图路由置信度不足: {tool_name} score={score:.3f} margin={margin:.3f}")
+            return None
+
+        slots = self.extract_slots(tool_name, query)
+        missing = [name for name in self._required.get(tool_name, []) if name not in slots]
+        if missing:
+            logger.info(f"本地意图路由缺少必填参数: {tool_name} {missing}")
+            return None
+
+        logger.info(f"本地意图路由命中: {tool_name} score={score:.3f} margin={margin:.3f} 参数={slots}")
+        return {
+            "actionType": "singleFunction",
+            "functions": [{
+                "funcName": tool_name,
+                "parameters": [{"name": name, "value": value} for name, value in slots.items()]
+            }]
+        }
+
+    @staticmethod
+    def _extract_season(query: str) -> Optional[str]:
+        for keyword, season in SEASON_KEYWORDS.items():
+            if f"{keyword}天" in query or f"{keyword}季" in query:
+                return season
+        month = MONTH_PATTERN.search(query)
+        if month:
+            return MONTH_SEASONS.get(int(month.group(1)))
+        return None
+
+intent_router = IntentRouter(
+    threshold=settings.INTENT_ROUTER_THRESHOLD,
+    margin=settings.INTENT_ROUTER_MARGIN
+)
@@ -1,38 +1,197 @@
-from openai import OpenAI
+import httpx
+from openai import AsyncOpenAI
 from app.core.config import settings
 from app.core.logger import logger
-from typing import Dict, Any, List
+from app.core import metrics
+from app.core import deadline
+from app.services.llm_cache import CompletionCache
+from app.services.singleflight import SingleFlight
+from typing import Dict, Any, AsyncIterator, List, Optional
+import time
 
 class QwenService:
     def __init__(self):
-        self.client = OpenAI(
+        # 共享的异步连接池，保持长连接以便并发请求复用
+        self.http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.QWEN_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.QWEN_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.QWEN_KEEPALIVE_EXPIRY
+            ),
+            timeout=httpx.Timeout(settings.QWEN_TIMEOUT, connect=settings.QWEN_CONNECT_TIMEOUT)
+        )
+        self.client = AsyncOpenAI(
             base_url=settings.QWEN_API_URL,
-            api_key="none"
+            api_key="none",
+            http_client=self.http_client,
+            max_retries=settings.QWEN_MAX_RETRIES
         )
         self.model = settings.QWEN_MODEL_NAME
+        self.cache = CompletionCache(
+            max_entries=settings.LLM_CACHE_MAX_ENTRIES,
+            max_bytes=settings.LLM_CACHE_MAX_BYTES,
+            ttl=settings.LLM_CACHE_TTL,
+            sqlite_path=settings.LLM_CACHE_SQLITE_PATH
+        ) if settings.LLM_CACHE_ENABLED else None
+        self.singleflight = SingleFlight("qwen") if settings.SINGLEFLIGHT_ENABLED else None
+        metrics.registry.register_collector(self._collect_metrics)
 
     async def create_completion(
         self,
         messages: List[Dict[str, str]],
         temperature: float = 0.7,
         max_tokens: int = 20000,
+        timeout: Optional[float] = None,
+        cache: Optional[bool] = None,
         **kwargs
     ) -> str:
         """
         调用通义千问API生成回复
+
+        Args:
+            timeout: 本次调用的超时时间（秒），为空时使用连接池默认超时
+            cache: 是否使用回复缓存，为空时仅缓存确定性调用（temperature 为 0）
+
+        当前请求设置了截止时间时，超过截止时间会取消调用并抛出 DeadlineExceeded
         """
+        use_cache = self.cache is not None and (temperature == 0 if cache is None else cache)
+        cache_key = None
+        if use_cache or self.singleflight is not None:
+            cache_key = CompletionCache.make_key(self.model, messages, temperature, max_tokens, **kwargs)
+        if use_cache:
+            cached = await self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+
+        async def call() -> str:
+            content = await self._request_completion(messages, temperature, max_tokens, **kwargs)
+            if use_cache and content:
+                await self.cache.set(cache_key, content)
+            return content
+
+        if self.singleflight is not None:
+            return await deadline.run(self.singleflight.do(cache_key, call))
+        return await deadline.run(call())
+
+    async def _request_completion(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: int,
+        **kwargs
+    ) -> str:
+        """实际发起一次补全请求"""
+        start = time.perf_counter()
         try:
-            response = self.client.chat.completions.create(
+            response = await self.client.chat.completions.create(
                 model=self.model,
                 messages=messages,
                 temperature=temperature,
                 max_tokens=max_tokens,
                 **kwargs
             )
+            usage = response.usage
+            metrics.record_llm_call(
+                time.perf_counter() - start,
+                prompt_tokens=usage.prompt_tokens if usage else 0,
+                completion_tokens=usage.completion_tokens if usage else 0
+            )
             return response.choices[0].message.content
-            
+
         except Exception as e:
             logger.error(f"Error calling Qwen API: {str(e)}")
             raise
 
-qwen_service = QwenService() 
\ No newline at end of file
+    async def stream_completion(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.7,
+        max_tokens: int = 20000,
+        timeout: Optional[float] = None,
+        cache: Optional[bool] = None,
+        **kwargs
+    ) -> AsyncIterator[str]:
+        """
+        以流式方式调用通义千问API，逐段产出生成的文本
+
+        当前请求设置了截止时间时，超过截止时间会关闭连接并抛出 DeadlineExceeded，
+        已产出的文本由调用方作为部分结果使用
+
+        cache 的含义与 create_completion 相同：命中缓存时一次产出缓存的完整回复，
+        未命中时流式调用，完整生成后写入缓存（超时中断的部分结果不缓存）
+        """
+        use_cache = self.cache is not None and (temperature == 0 if cache is None else cache)
+        cache_key = None
+        if use_cache:
+            cache_key = CompletionCache.make_key(self.model, messages, temperature, max_tokens, **kwargs)
+            cached = await self.cache.get(cache_key)
+            if cached is not None:
+                yield cached
+                return
+
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+        parts: List[str] = []
+        start = time.perf_counter()
+        usage = None
+        stream = None
+        try:
+            stream = await deadline.run(self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                stream=True,
+                **kwargs
+            ))
+            chunks = stream.__aiter__()
+            while True:
+                try:
+                    chunk = await deadline.run(chunks.__anext__())
+                except StopAsyncIteration:
+                    break
+                if getattr(chunk, "usage", None):
+                    usage = chunk.usage
+                if chunk.choices and chunk.choices[0].delta.content:
+                    parts.append(chunk.choices[0].delta.content)
+                    yield chunk.choices[0].delta.content
+            metrics.record_llm_call(
+                time.perf_counter() - start,
+                prompt_tokens=usage.prompt_tokens if usage else 0,
+                completion_tokens=usage.completion_tokens if usage else 0
+            )
+            if use_cache and parts:
+                await self.cache.set(cache_key, "".join(parts))
+
+        except deadline.DeadlineExceeded:
+            logger.warning("流式调用超过截止时间，已关闭连接")
+            raise
+        except Exception as e:
+            logger.error(f"Error streaming Qwen API: {str(e)}")
+            raise
+        finally:
+            if stream is not None:
+                await stream.close()
+
+    def _collect_metrics(self):
+        """导出缓存与合并调用统计"""
+        if self.cache is not None:
+            stats = self.cache.stats()
+            yield "travel_llm_cache_hits", "LLM completion cache hits", {}, stats["hits"]
+            yield "travel_llm_cache_misses", "LLM completion cache misses", {}, stats["misses"]
+            yield "travel_llm_cache_entries", "LLM completion cache entries in memory", {}, stats["entries"]
+        if self.singleflight is not None:
+            stats = self.singleflight.stats()
+            yield "travel_singleflight_deduplicated", "Calls served by a shared in-flight execution", {"name": "qwen"}, stats["deduplicated"]
+            yield "travel_singleflight_executions", "Executions started by single-flight groups", {"name": "qwen"}, stats["executions"]
+
+    async def close(self):
+        """关闭底层连接池"""
+        await self.client.close()
+        if self.cache is not None:
+            self.cache.close()
+
+qwen_service = QwenService()
@@ -1,13 +1,18 @@
 from app.core.logger import logger
+from app.core import metrics
+from app.core import deadline
 from app.services.vector_store import vector_store
 from app.services.qwen_service import qwen_service
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Union
+import asyncio
+import re
 
 class RAGService:
     # 搜索配置常量
     EXACT_MATCH_K = 1  # 精确匹配返回数量
     FUZZY_MATCH_K = 2  # 模糊匹配返回数量
     MULTI_MATCH_K = 3  # 多关键词匹配返回数量
+    REWRITE_TEMPERATURE = 0  # 查询改写为确定性调用，相同输入直接使用大模型回复缓存
     
     def __init__(self):
         # 定义工具名称到增强方法的映射
@@ -19,13 +24,30 @@ class RAGService:
             "general_tool": self._enhance_general_query
         }
     
-    async def _search_spots(self, query: str, k: int = FUZZY_MATCH_K):
-        """统一的景点搜索方法"""
-        return vector_store.search("spots", query, k=k)
+    async def _search_spots(self, query: str, k: int = FUZZY_MATCH_K, **search_params):
+        """统一的景点搜索方法，search_params 可包含元数据过滤条件 filter"""
+        return await vector_store.asearch("spots", query, k=k, **search_params)
         
     async def _search_routes(self, query: str, k: int = FUZZY_MATCH_K):
         """统一的路线搜索方法"""
-        return vector_store.search("routes", query, k=k)
+        return await vector_store.asearch("routes", query, k=k)
+
+    async def _search_spots_many(self, queries: List[str], k: int = FUZZY_MATCH_K, **search_params) -> List[Dict]:
+        """批量搜索景点，合并所有查询的结果"""
+        results = await vector_store.asearch_many("spots", queries, k=k, **search_params)
+        return [doc for docs in results for doc in docs]
+
+    async def _search_routes_many(self, queries: List[str], k: int = FUZZY_MATCH_K) -> List[Dict]:
+        """批量搜索路线，合并所有查询的结果"""
+        results = await vector_store.asearch_many("routes", queries, k=k)
+        return [doc for docs in results for doc in docs]
+
+    @staticmethod
+    def _split_terms(value: Union[str, List[str]]) -> List[str]:
+        """将参数值拆分为检索词列表（字符串按中英文逗号、顿号分隔）"""
+        if isinstance(value, str):
+            value = re.split(r"[,，、]", value)
+        return [str(term).strip() for term in value if str(term).strip()]
     
     async def enhance_query(self, query: str, tool_name: str = None, **kwargs) -> str:
         """增强查询
@@ -46,15 +68,29 @@ class RAGService:
             if histories:
                 query = await self._optimize_with_history(query, histories)
                 
-            # 使用工具特定方法进一步增强查询
-            enhanced_query = await enhance_method(query, **kwargs)
+            # 使用工具特定方法进一步增强查询；检索增强预算作为嵌套截止时间，
+            # 改写先到期时返回已检索的上下文，外层等待只作为兜底
+            with metrics.stage("rag"), deadline.scope(deadline.budget("rag")):
+                enhanced_query = await deadline.run(enhance_method(query, **kwargs), grace=deadline.GRACE_PERIOD)
             
             return enhanced_query
                 
         except Exception as e:
             logger.error(f"查询增强失败: {str(e)}")
+            # 降级为原始查询，基于它生成的回答不缓存
+            deadline.mark_partial("rag")
             return query
             
+    async def _rewrite(self, query: str, context: str, messages: List[Dict[str, str]]) -> str:
+        """用大模型基于检索上下文改写查询；超过截止时间时返回原始查询和已检索的上下文"""
+        try:
+            enhanced_query = await qwen_service.create_completion(messages, temperature=self.REWRITE_TEMPERATURE)
+            return enhanced_query.strip()
+        except deadline.DeadlineExceeded:
+            logger.warning("查询改写超过截止时间，返回原始查询和检索到的上下文")
+            deadline.mark_partial("rag")
+            return f"{query}\n\n{context}".strip()
+
     async def _optimize_with_history(self, query: str, histories: List[Dict[str, str]]) -> str:
         """使用历史对话优化当前查询"""
         try:
@@ -78,7 +114,7 @@ class RAGService:
                 {"role": "user", "content": prompt}
             ]
             
-            optimized_query = await qwen_service.create_completion(messages)
+            optimized_query = await qwen_service.create_completion(messages, temperature=self.REWRITE_TEMPERATURE)
             return optimized_query.strip()
             
         except Exception as e:
@@ -87,24 +123,16 @@ class RAGService:
             
     async def _enhance_spot_info_query(self, query: str, **kwargs) -> str:
         """增强景点信息查询"""
-        spot_list = kwargs.get("spot_list", [])
+        spot_list = self._split_terms(kwargs.get("spot_list", []))
         if not spot_list:
             return query
             
-        # 检索相关景点信息
-        spot_docs = []
-        for spot in spot_list:
-            # 使用景点名称进行精确匹配
-            results = await self._search_spots(spot, k=self.EXACT_MATCH_K)
-            if results:
-                spot_docs.extend(results)
+        # 检索相关景点信息：使用景点名称进行精确匹配（所有景点一次批量检索）
+        spot_docs = await self._search_spots_many(spot_list, k=self.EXACT_MATCH_K)
                 
         if not spot_docs:
             # 如果没有找到精确匹配，尝试模糊搜索
-            for spot in spot_list:
-                results = await self._search_spots(spot, k=self.FUZZY_MATCH_K)
-                if results:
-                    spot_docs.extend(results)
+            spot_docs = await self._search_spots_many(spot_list, k=self.FUZZY_MATCH_K)
                     
         if not spot_docs:
             return query
@@ -128,14 +156,15 @@ class RAGService:
             {"role": "user", "content": prompt}
         ]
         
-        enhanced_query = await qwen_service.create_completion(messages)
-        return enhanced_query.strip()
+        return await self._rewrite(query, context, messages)
         
     async def _enhance_spot_recommend_query(self, query: str, **kwargs) -> str:
         """增强景点推荐查询"""
         season = kwargs.get("season", "")
         days = kwargs.get("days", "")
         preference = kwargs.get("preference", "")
+        location = kwargs.get("location", "")
+        min_rating = kwargs.get("min_rating")
         
         # 构建检索条件
         search_terms = []
@@ -143,18 +172,21 @@ class RAGService:
             search_terms.append(season)
         if preference:
             search_terms.append(preference)
+
+        # 地区和评分作为元数据过滤条件，只检索满足条件的景点
+        spot_filter = {}
+        if location:
+            spot_filter["location"] = self._split_terms(location)
+        if min_rating:
+            spot_filter["min_rating"] = float(min_rating)
+        search_params = {"filter": spot_filter} if spot_filter else {}
             
-        # 检索相关景点
-        spot_docs = []
-        for term in search_terms:
-            # 使用多个关键词进行检索
-            results = await self._search_spots(term, k=self.MULTI_MATCH_K)
-            if results:
-                spot_docs.extend(results)
+        # 检索相关景点：多个关键词一次批量检索
+        spot_docs = await self._search_spots_many(search_terms, k=self.MULTI_MATCH_K, **search_params)
                 
         if not spot_docs and query:
             # 如果没有找到相关景点，使用原始查询进行检索
-            results = await self._search_spots(query, k=self.MULTI_MATCH_K)
+            results = await self._search_spots(query, k=self.MULTI_MATCH_K, **search_params)
             if results:
                 spot_docs.extend(results)
                 
@@ -175,6 +207,8 @@ class RAGService:
 季节：{season}
 天数：{days}
 偏好：{preference}
+地区：{location}
+最低评分：{min_rating or ''}
 
 请生成一个更详细的查询，重点关注符合用户偏好的景点推荐。保持查询简洁，只返回增强后的查询文本。"""
 
@@ -183,8 +217,7 @@ class RAGService:
             {"role": "user", "content": prompt}
         ]
         
-        enhanced_query = await qwen_service.create_completion(messages)
-        return enhanced_query.strip()
+        return await self._rewrite(query, context, messages)
         
     async def _enhance_route_recommend_query(self, query: str, **kwargs) -> str:
         """增强路线推荐查询"""
@@ -231,8 +264,7 @@ class RAGService:
             {"role": "user", "content": prompt}
         ]
         
-        enhanced_query = await qwen_service.create_completion(messages)
-        return enhanced_query.strip()
+        return await self._rewrite(query, context, messages)
         
     async def _enhance_deep_search_query(self, query: str, **kwargs) -> str:
         """增强深度搜索查询"""
@@ -243,20 +275,11 @@ class RAGService:
         if focus:
             search_terms.append(focus)
             
-        # 检索相关景点和路线
-        spot_docs = []
-        route_docs = []
-        
-        for term in search_terms:
-            # 检索景点
-            results = await self._search_spots(term, k=self.FUZZY_MATCH_K)
-            if results:
-                spot_docs.extend(results)
-                
-            # 检索路线
-            results = await self._search_routes(term, k=self.EXACT_MATCH_K)
-            if results:
-                route_docs.extend(results)
+        # 检索相关景点和路线：每个集合一次批量检索，两个集合并发执行
+        spot_docs, route_docs = await asyncio.gather(
+            self._search_spots_many(search_terms, k=self.FUZZY_MATCH_K),
+            self._search_routes_many(search_terms, k=self.EXACT_MATCH_K)
+        )
                 
         # 构建上下文
         context_parts = []
@@ -293,28 +316,18 @@ class RAGService:
             {"role": "user", "content": prompt}
         ]
         
-        enhanced_query = await qwen_service.create_completion(messages)
-        return enhanced_query.strip()
+        return await self._rewrite(query, context, messages)
         
     async def _enhance_general_query(self, query: str) -> str:
         """增强通用查询"""
         # 构建检索条件
         search_terms = [query]
         
-        # 检索相关景点和路线
-        spot_docs = []
-        route_docs = []
-        
-        for term in search_terms:
-            # 检索景点
-            results = await self._search_spots(term, k=self.FUZZY_MATCH_K)
-            if results:
-                spot_docs.extend(results)
-                
-            # 检索路线
-            results = await self._search_routes(term, k=self.EXACT_MATCH_K)
-            if results:
-                route_docs.extend(results)
+        # 检索相关景点和路线：每个集合一次批量检索，两个集合并发执行
+        spot_docs, route_docs = await asyncio.gather(
+            self._search_spots_many(search_terms, k=self.FUZZY_MATCH_K),
+            self._search_routes_many(search_terms, k=self.EXACT_MATCH_K)
+        )
                 
         # 构建上下文
         context_parts = []
@@ -350,7 +363,6 @@ class RAGService:
             {"role": "user", "content": prompt}
         ]
         
-        enhanced_query = await qwen_service.create_completion(messages)
-        return enhanced_query.strip()
+        return await self._rewrite(query, context, messages)
 
 rag_service = RAGService() 
\ No newline at end of file
@@ -0,0 +1,108 @@
+from app.core.config import settings
+from app.core.logger import logger
+from app.core import metrics
+from app.db.session import Session
+from app.db.models import ChatHistory
+from typing import Dict, List, Optional
+import asyncio
+
+class RecordWriter:
+    """ChatHistory 记录的异步批量写入（write-behind）
+
+    请求路径只负责把记录放入队列，后台任务按批量大小或时间间隔触发写入，
+    每批使用一个事务。队列满时 submit 会等待，形成背压；stop 会写完所有剩余记录。
+    未启动时（如脚本环境）submit 直接在线程池中写入。
+    """
+
+    def __init__(self, batch_size: int = 50, flush_interval: float = 1.0, max_queue_size: int = 1000):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue_size = max_queue_size
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self._buffer: List[Dict[str, str]] = []
+        self.written = 0  # 已写入的记录数
+        self.failed = 0  # 写入失败的记录数
+        metrics.registry.register_collector(self._collect_metrics)
+
+    @property
+    def running(self) -> bool:
+        return self._worker is not None and not self._worker.done()
+
+    async def start(self):
+        """启动后台写入任务"""
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._worker = asyncio.create_task(self._run())
+        logger.info("启动执行记录批量写入任务")
+
+    async def submit(self, session_id: str, user_query: str, assistant_response: str):
+        """提交一条记录，队列已满时等待"""
+        record = {
+            "session_id": session_id,
+            "user_query": user_query,
+            "assistant_response": assistant_response
+        }
+        if not self.running:
+            await asyncio.to_thread(self._write_batch, [record])
+            return
+        await self._queue.put(record)
+
+    async def stop(self):
+        """停止后台任务，并写入所有尚未落库的记录"""
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        await asyncio.gather(self._worker, return_exceptions=True)
+        self._worker = None
+        if self._flush_task is not None:
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+        while not self._queue.empty():
+            self._buffer.append(self._queue.get_nowait())
+        if self._buffer:
+            batch, self._buffer = self._buffer, []
+            await asyncio.to_thread(self._write_batch, batch)
+        logger.info(f"执行记录批量写入任务已停止，共写入 {self.written} 条")
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            self._buffer.append(await self._queue.get())
+            deadline = loop.time() + self.flush_interval
+            while len(self._buffer) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    self._buffer.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            batch, self._buffer = self._buffer, []
+            self._flush_task = asyncio.ensure_future(asyncio.to_thread(self._write_batch, batch))
+            # 关闭时写入任务被取消也不影响正在进行的写入
+            await asyncio.shield(self._flush_task)
+            self._flush_task = None
+
+    def _write_batch(self, batch: List[Dict[str, str]]):
+        """在一个事务中写入一批记录"""
+        try:
+            with metrics.stage("record_flush"), Session() as session:
+                session.bulk_insert_mappings(ChatHistory, batch)
+            self.written += len(batch)
+        except Exception as e:
+            self.failed += len(batch)
+            logger.error(f"批量写入执行记录失败（{len(batch)} 条）: {str(e)}")
+
+    def _collect_metrics(self):
+        yield "travel_record_writer_queue_size", "Records waiting to be written", {}, self._queue.qsize() if self._queue else 0
+        yield "travel_record_writer_written", "Records written by the write-behind queue", {}, self.written
+        yield "travel_record_writer_failed", "Records that failed to be written", {}, self.failed
+
+record_writer = RecordWriter(
+    batch_size=settings.RECORD_WRITER_BATCH_SIZE,
+    flush_interval=settings.RECORD_WRITER_FLUSH_INTERVAL,
+    max_queue_size=settings.RECORD_WRITER_QUEUE_SIZE
+)
@@ -0,0 +1,87 @@
+from contextlib import contextmanager
+from typing import Optional
+import threading
+
+class ReadWriteLock:
+    """线程读写锁
+
+    多个读者可以同时持有读锁，写者独占；等待中的写者优先于新到达的读者，避免写者饥饿。
+    写锁可重入，持有写锁的线程可以直接获取读锁；读锁可重入，但持有读锁时不能升级为写锁。
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0  # 持有读锁的线程数
+        self._writer: Optional[int] = None  # 持有写锁的线程
+        self._writer_depth = 0  # 写锁重入次数
+        self._waiting_writers = 0
+        self._local = threading.local()  # 当前线程的读锁重入次数
+
+    def acquire_read(self):
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer == me:
+                # 持有写锁时读取不需要再加锁
+                self._local.nested = getattr(self._local, "nested", 0) + 1
+                return
+            depth = getattr(self._local, "depth", 0)
+            if not depth:
+                while self._writer is not None or self._waiting_writers:
+                    self._cond.wait()
+                self._readers += 1
+            self._local.depth = depth + 1
+
+    def release_read(self):
+        with self._cond:
+            if getattr(self._local, "nested", 0):
+                self._local.nested -= 1
+                return
+            self._local.depth -= 1
+            if not self._local.depth:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    def acquire_write(self):
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer == me:
+                self._writer_depth += 1
+                return
+            if getattr(self._local, "depth", 0):
+                raise RuntimeError("持有读锁时不能获取写锁")
+            self._waiting_writers += 1
+            try:
+                while self._writer is not None or self._readers:
+                    self._cond.wait()
+            except BaseException:
+                # 等待被中断时唤醒因等待写者而阻塞的读者
+                self._waiting_writers -= 1
+                self._cond.notify_all()
+                raise
+            self._waiting_writers -= 1
+            self._writer = me
+            self._writer_depth = 1
+
+    def release_write(self):
+        with self._cond:
+            self._writer_depth -= 1
+            if not self._writer_depth:
+                self._writer = None
+                self._cond.notify_all()
+
+    @contextmanager
+    def read(self):
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write(self):
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
@@ -0,0 +1,70 @@
+from app.core.logger import logger
+from typing import Dict, Any, Awaitable, Callable, Hashable, TypeVar
+import asyncio
+
+T = TypeVar("T")
+
+class SingleFlight:
+    """合并并发的相同调用
+
+    同一个 key 在执行期间只会真正执行一次，期间到达的相同调用等待并共享这次执行的结果。
+    执行结束后 key 立即释放，之后的调用会重新执行（结果缓存由调用方自行负责）。
+    单个调用方被取消（如超过截止时间）不影响其他调用方；所有调用方都取消后取消共享的执行，
+    不再占用连接和上游资源。
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._waiters: Dict[asyncio.Future, int] = {}  # 执行 -> 等待结果的调用方数
+        self.calls = 0  # 总调用次数
+        self.executions = 0  # 实际执行次数
+        self.deduplicated = 0  # 被合并的调用次数
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """执行 fn，若相同 key 的调用正在进行则等待其结果"""
+        self.calls += 1
+        task = self._inflight.get(key)
+        if task is None:
+            self.executions += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._release(key, t))
+        else:
+            self.deduplicated += 1
+            logger.debug(f"合并重复调用 [{self.name}]: {key}")
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            # shield 保证单个调用方被取消时不会取消共享的执行
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if self._waiters.get(task) == 1 and not task.done():
+                logger.debug(f"调用方均已取消，取消共享的执行 [{self.name}]: {key}")
+                task.cancel()
+            raise
+        finally:
+            if task in self._waiters:
+                self._waiters[task] -= 1
+                if not self._waiters[task]:
+                    del self._waiters[task]
+
+    def _release(self, key: Hashable, task: asyncio.Future):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        self._waiters.pop(task, None)
+        # 读取异常，避免所有调用方都已取消时出现未处理异常的警告
+        if not task.cancelled():
+            task.exception()
+
+    @property
+    def inflight(self) -> int:
+        return len(self._inflight)
+
+    def stats(self) -> Dict[str, Any]:
+        """合并统计"""
+        return {
+            "calls": self.calls,
+            "executions": self.executions,
+            "deduplicated": self.deduplicated,
+            "inflight": self.inflight
+        }
@@ -0,0 +1,62 @@
+from app.core.logger import logger
+from contextvars import ContextVar
+from typing import Dict, Any, AsyncIterator, Awaitable, Callable, Optional
+import asyncio
+import itertools
+import json
+
+# 当前请求的事件队列，仅在流式请求中存在
+_event_queue: ContextVar[Optional[asyncio.Queue]] = ContextVar("stream_event_queue", default=None)
+
+_answer_ids = itertools.count(1)
+
+_DONE = object()
+
+def is_streaming() -> bool:
+    """当前请求是否为流式请求"""
+    return _event_queue.get() is not None
+
+def emit_event(event: str, **data: Any):
+    """向当前流式请求推送事件，非流式请求时不做任何处理"""
+    queue = _event_queue.get()
+    if queue is not None:
+        queue.put_nowait((event, data))
+
+def next_answer_id() -> int:
+    """分配一个回答编号，用于区分同一请求中的多段流式回答"""
+    return next(_answer_ids)
+
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    """格式化为 Server-Sent Events 消息"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+async def _run(runner: Callable[[], Awaitable[Any]], queue: asyncio.Queue):
+    try:
+        result = await runner()
+        queue.put_nowait(("done", {"data": result}))
+    except Exception as e:
+        logger.error(f"流式处理失败: {str(e)}")
+        queue.put_nowait(("error", {"message": str(e)}))
+    finally:
+        queue.put_nowait(_DONE)
+
+async def stream_events(runner: Callable[[], Awaitable[Any]]) -> AsyncIterator[str]:
+    """在后台执行 runner，并将其间推送的事件以 SSE 格式逐条产出"""
+    queue: asyncio.Queue = asyncio.Queue()
+    token = _event_queue.set(queue)
+    try:
+        task = asyncio.create_task(_run(runner, queue))
+    finally:
+        _event_queue.reset(token)
+
+    try:
+        while True:
+            item = await queue.get()
+            if item is _DONE:
+                break
+            event, data = item
+            yield format_sse(event, data)
+    finally:
+        # 客户端断开时取消后台任务
+        if not task.done():
+            task.cancel()
@@ -0,0 +1,108 @@
+from app.core.logger import logger
+from app.core import metrics
+from app.core import deadline
+from app.services.qwen_service import qwen_service
+from app.services.conversation_store import ConversationStore, conversation_store
+from typing import Dict, List, Set
+import asyncio
+
+class ConversationSummarizer:
+    """增量式对话摘要
+
+    为每个会话维护一份滚动摘要，每轮对话结束后只把最新一轮并入摘要，
+    可以放到响应返回之后在后台执行，避免在请求关键路径上重新总结整段历史。
+    """
+
+    MAX_ANSWER_CHARS = 2000  # 并入摘要时助手回复的最大长度
+
+    def __init__(self, store: ConversationStore):
+        self.store = store
+        self._pending: Dict[str, asyncio.Task] = {}  # 会话ID -> 正在执行的摘要任务
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def context_for(self, session_id: str, query: str, histories: List[Dict[str, str]]) -> str:
+        """生成本轮请求使用的对话上下文：已有摘要 + 当前用户需求"""
+        await self.wait(session_id)
+        summary = await self.store.get_summary(session_id)
+        if not summary and await self.store.has_turns(session_id):
+            # 会话从持久化存储恢复，尚无摘要时完整总结一次
+            summary = await self.rebuild(session_id, histories)
+
+        if not summary:
+            return f"当前用户需求：{query}"
+        return f"历史对话摘要：{summary}\n当前用户需求：{query}"
+
+    async def fold(self, session_id: str, user: str, assistant: str) -> str:
+        """将最新一轮对话并入会话摘要"""
+        previous = await self.store.get_summary(session_id)
+        prompt = f"""已有对话摘要：
+{previous or '无'}
+
+最新一轮对话：
+用户：{user}
+助手：{assistant[:self.MAX_ANSWER_CHARS]}
+
+请将最新一轮对话并入摘要，保留用户的出行需求、偏好和已确认的信息。只返回更新后的摘要。"""
+
+        messages = [
+            {"role": "system", "content": "你是一个专业的大模型改写优化家，负责维护多轮对话的滚动摘要"},
+            {"role": "user", "content": prompt}
+        ]
+        try:
+            with metrics.stage("summary_fold"):
+                summary = (await qwen_service.create_completion(messages)).strip()
+            await self.store.set_summary(session_id, summary)
+            return summary
+        except Exception as e:
+            logger.error(f"更新对话摘要失败: {str(e)}")
+            return previous
+
+    async def rebuild(self, session_id: str, histories: List[Dict[str, str]]) -> str:
+        """根据最近的对话历史重新生成摘要"""
+        messages = [{
+            "role": "system",
+            "content": "你是一个专业的大模型改写优化家,总结下面的多轮对话内容并优化用户提出的需求"
+        }]
+        messages.extend(histories[-5:])
+        try:
+            with metrics.stage("summary"):
+                summary = (await qwen_service.create_completion(messages)).strip()
+            await self.store.set_summary(session_id, summary)
+            return summary
+        except Exception as e:
+            logger.error(f"重建对话摘要失败: {str(e)}")
+            return ""
+
+    def schedule_fold(self, session_id: str, user: str, assistant: str):
+        """在后台将最新一轮对话并入摘要"""
+        previous = self._pending.get(session_id)
+
+        async def run():
+            # 在响应返回后执行，不受请求截止时间限制
+            with deadline.detached():
+                if previous is not None:
+                    await asyncio.gather(previous, return_exceptions=True)
+                await self.fold(session_id, user, assistant)
+
+        task = asyncio.create_task(run())
+        self._pending[session_id] = task
+        self._tasks.add(task)
+        task.add_done_callback(lambda t: self._on_done(session_id, t))
+
+    async def wait(self, session_id: str):
+        """等待该会话的后台摘要任务完成"""
+        task = self._pending.get(session_id)
+        if task is not None:
+            await asyncio.gather(task, return_exceptions=True)
+
+    async def drain(self):
+        """等待所有后台摘要任务完成（用于服务关闭）"""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def _on_done(self, session_id: str, task: asyncio.Task):
+        self._tasks.discard(task)
+        if self._pending.get(session_id) is task:
+            del self._pending[session_id]
+
+conversation_summarizer = ConversationSummarizer(conversation_store)
@@ -0,0 +1,132 @@
+from app.core.config import settings
+from app.core.logger import logger
+from app.core import metrics
+from app.core.tools import TOOL_CACHE_POLICIES
+from app.db.crud import register_change_listener
+from app.services.llm_cache import LRUTTLCache
+from typing import Any, Dict, Optional
+import hashlib
+import json
+import re
+
+# 列表类参数中的分隔符（英文逗号、中文逗号、顿号）
+_LIST_SEPARATORS = re.compile(r"\s*[,，、]\s*")
+_WHITESPACE = re.compile(r"\s+")
+
+def _normalize_value(value: Any, as_list: bool = False) -> Any:
+    """规范化参数值：去除多余空白；列表类参数按分隔符拆分并按元素排序，使等价的调用得到相同的键
+
+    只有 as_list 为真（策略中声明为列表类的参数）时才拆分和排序，自由文本中元素的顺序有意义
+    """
+    if isinstance(value, str):
+        value = _WHITESPACE.sub(" ", value.strip())
+        if not as_list:
+            return value
+        items = [item for item in _LIST_SEPARATORS.split(value) if item]
+        return sorted(items) if len(items) > 1 else value
+    if isinstance(value, (list, tuple)):
+        items = [_normalize_value(item) for item in value]
+        if not as_list:
+            return items
+        return sorted(items, key=lambda item: json.dumps(item, ensure_ascii=False, sort_keys=True))
+    if isinstance(value, dict):
+        return {str(k): _normalize_value(v) for k, v in value.items()}
+    return value
+
+class ToolResultCache:
+    """工具结果缓存
+
+    以工具名称 + 规范化后的参数作为键，各工具的过期时间、对话摘要的处理方式和
+    依赖的数据集合由 TOOL_CACHE_POLICIES 声明，未声明策略的工具不缓存。
+    景点/路线数据变更时，通过提升对应集合的版本号使依赖它的缓存全部失效，
+    旧条目随后由 LRU 淘汰。
+    """
+
+    def __init__(self, policies: Dict[str, Dict], max_entries: int = 1024, max_bytes: int = 0):
+        self.policies = policies
+        self._cache = LRUTTLCache(max_entries=max_entries, max_bytes=max_bytes)
+        self._generations: Dict[str, int] = {}  # 集合名/工具名 -> 版本号
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def make_key(self, tool_name: str, parameters: Dict[str, Any]) -> Optional[str]:
+        """生成缓存键，工具未启用缓存时返回 None"""
+        policy = self.policies.get(tool_name)
+        if not policy:
+            return None
+
+        params = dict(parameters)
+        summary = params.pop("summary", None)
+        list_params = set(policy.get("list_params", []))
+        params = {name: _normalize_value(value, name in list_params) for name, value in params.items()}
+        if policy.get("summary", "hash") == "hash" and summary:
+            params["summary"] = hashlib.sha256(str(summary).encode("utf-8")).hexdigest()
+
+        generations = {
+            name: self._generations.get(name, 0)
+            for name in [tool_name] + list(policy.get("depends_on", []))
+        }
+        payload = json.dumps(
+            {"tool": tool_name, "params": params, "generations": generations},
+            ensure_ascii=False,
+            sort_keys=True
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self._cache.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, tool_name: str, key: str, value: Any):
+        policy = self.policies.get(tool_name) or {}
+        self._cache.set(key, value, ttl=policy.get("ttl"))
+
+    def invalidate_collection(self, collection: str):
+        """数据集合变更时，使依赖它的所有工具缓存失效"""
+        self._generations[collection] = self._generations.get(collection, 0) + 1
+        self.invalidations += 1
+        logger.info(f"数据集合 {collection} 已变更，相关工具缓存失效")
+
+    def invalidate_tool(self, tool_name: str):
+        """使某个工具的所有缓存失效"""
+        self._generations[tool_name] = self._generations.get(tool_name, 0) + 1
+        self.invalidations += 1
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "invalidations": self.invalidations,
+            "entries": len(self._cache),
+            "bytes": self._cache.size_bytes,
+        }
+
+    def _on_change(self, collection: str, action: str, record_id: int):
+        self.invalidate_collection(collection)
+
+    def _collect_metrics(self):
+        stats = self.stats()
+        yield "travel_tool_cache_hits", "Tool result cache hits", {}, stats["hits"]
+        yield "travel_tool_cache_misses", "Tool result cache misses", {}, stats["misses"]
+        yield "travel_tool_cache_entries", "Tool result cache entries", {}, stats["entries"]
+        yield "travel_tool_cache_bytes", "Tool result cache size in bytes", {}, stats["bytes"]
+
+tool_cache = ToolResultCache(
+    TOOL_CACHE_POLICIES,
+    max_entries=settings.TOOL_CACHE_MAX_ENTRIES,
+    max_bytes=settings.TOOL_CACHE_MAX_BYTES
+) if settings.TOOL_CACHE_ENABLED else None
+
+if tool_cache is not None:
+    register_change_listener(tool_cache._on_change)
+    metrics.registry.register_collector(tool_cache._collect_metrics)
@@ -1,7 +1,15 @@
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Optional, Tuple
 from app.services.qwen_service import qwen_service
+from app.services.completeness import (
+    score_completeness, split_self_assessment, SELF_ASSESSMENT_MARKER, SELF_ASSESSMENT_PROMPT
+)
+from app.core.config import settings
 from app.core.logger import logger
+from app.core.tokens import count_tokens, count_message_tokens
+from app.core import metrics
+from app.core import deadline
 from app.services.rag_service import rag_service
+from app.services.streaming import is_streaming, emit_event, next_answer_id
 
 async def need_followup(result: str, **kwargs) -> Tuple[bool, str]:
     """判断是否需要追问
@@ -33,7 +41,8 @@ async def need_followup(result: str, **kwargs) -> Tuple[bool, str]:
             {"role": "user", "content": prompt}
         ]
         
-        response = await qwen_service.create_completion(messages)
+        with metrics.stage("followup_check"):
+            response = await deadline.run(qwen_service.create_completion(messages, temperature=0), "followup_check")
         
         # 解析响应
         lines = response.strip().split('\n')
@@ -46,33 +55,168 @@ async def need_followup(result: str, **kwargs) -> Tuple[bool, str]:
         logger.error(f"判断追问失败: {str(e)}")
         return False, ""
 
-async def get_content(message: List[Dict[str, str]], **kwargs) -> str:
-    """基础对话内容获取函数"""
+async def generate_answer(messages: List[Dict[str, str]], stop_marker: Optional[str] = None) -> str:
+    """生成回答，流式请求时边生成边推送 token
+
+    Args:
+        stop_marker: 流式推送时遇到该标记即停止推送（标记之后为不展示给用户的自评），
+            返回值仍包含完整输出
+    """
+    with metrics.stage("answer"):
+        if not is_streaming():
+            return await qwen_service.create_completion(messages)
+        return await _stream_answer(messages, stop_marker)
+
+def _marker_prefix_length(text: str, marker: str) -> int:
+    """text 末尾可能是 marker 开头部分的长度"""
+    for length in range(min(len(text), len(marker) - 1), 0, -1):
+        if marker.startswith(text[-length:]):
+            return length
+    return 0
+
+async def _stream_answer(messages: List[Dict[str, str]], stop_marker: Optional[str] = None) -> str:
+    """流式生成回答并推送 token，超过截止时间时返回已生成的部分"""
+
+    answer_id = next_answer_id()
+    emit_event("answer_start", id=answer_id)
+    parts = []
+    pending = ""  # 尚未推送的文本，可能是标记的开头
+    stopped = False
     try:
+        async for delta in qwen_service.stream_completion(messages):
+            parts.append(delta)
+            if stopped:
+                continue
+            if not stop_marker:
+                emit_event("token", id=answer_id, content=delta)
+                continue
+            pending += delta
+            index = pending.find(stop_marker)
+            if index >= 0:
+                pending, stopped = pending[:index], True
+                keep = 0
+            else:
+                keep = _marker_prefix_length(pending, stop_marker)
+            if len(pending) > keep:
+                emit_event("token", id=answer_id, content=pending[:len(pending) - keep])
+                pending = pending[len(pending) - keep:]
+        if pending and not stopped:
+            emit_event("token", id=answer_id, content=pending)
+    except deadline.DeadlineExceeded:
+        if not parts:
+            raise
+        logger.warning("回答生成超过截止时间，返回已生成的部分")
+        deadline.mark_partial("answer")
+    finally:
+        emit_event("answer_end", id=answer_id)
+    return "".join(parts)
+
+async def review_answer(
+    result: str,
+    request: str,
+    iteration: int,
+    used_tokens: int,
+    messages: List[Dict[str, str]],
+    verdict: Optional[Dict[str, Any]] = None,
+    **kwargs
+) -> Tuple[str, str]:
+    """判断回答是否需要追问
+
+    先用本地完整度评分检查回答是否覆盖了用户询问的要点，覆盖时不再调用大模型检查；
+    回答附带了自评结果时直接使用自评，否则单独调用大模型检查。
+    追问轮数、token 预算或请求截止时间用完时直接返回当前回答。
+
+    Returns:
+        (path, followup_question): 判断路径及追问内容（不需要追问时为空）
+    """
+    score, missing = score_completeness(request, result)
+    followup = ""
+    if score >= settings.COMPLETENESS_THRESHOLD:
+        path = "local_pass"
+    elif verdict is not None and verdict.get("complete"):
+        path = "self_pass"
+    elif iteration >= settings.FOLLOWUP_MAX_ITERATIONS:
+        path = "max_iterations"
+    elif deadline.expired():
+        path = "deadline"
+        deadline.mark_partial("followup")
+    elif used_tokens + count_message_tokens(messages) + count_tokens(result) > settings.FOLLOWUP_MAX_TOKENS:
+        path = "token_budget"
+    elif verdict is not None:
+        followup = str(verdict.get("followup") or "").strip()
+        # 自评判定不完整但未给出追问时，按自评（或本地评分）缺失的要点追问
+        gaps = verdict.get("missing") or missing
+        if not followup and gaps:
+            followup = f"请补充以下方面的信息：{'、'.join(map(str, gaps))}"
+        path = "self_followup" if followup else "self_pass"
+    else:
+        need_more, followup = await need_followup(result, **kwargs)
+        path = "llm_followup" if need_more and followup else "llm_pass"
+
+    logger.info(f"回答完整度判断: 路径={path}, 轮次={iteration}, 评分={score:.2f}, 缺失要点={missing}")
+    metrics.record_followup(path)
+    return path, followup if path in ("llm_followup", "self_followup") else ""
+
+def use_self_assessment(tool_name: Optional[str]) -> bool:
+    """该工具是否使用回答与自评合并的单次调用模式"""
+    tools = settings.SELF_ASSESSMENT_TOOLS
+    return bool(tool_name) and (tool_name in tools or "*" in tools)
+
+async def get_content(message: List[Dict[str, str]], tool_name: Optional[str] = None, **kwargs) -> str:
+    """基础对话内容获取函数
+
+    回答不完整时追加追问，追问轮数和消耗的 token 数分别受
+    FOLLOWUP_MAX_ITERATIONS 和 FOLLOWUP_MAX_TOKENS 限制。
+    tool_name 在 SELF_ASSESSMENT_TOOLS 中时，模型在回答末尾附带完整度自评，
+    自评从回答中去除后用于判断是否追问，省去单独的检查调用。
+    """
+    try:
+        self_assess = use_self_assessment(tool_name)
+        system_prompt = "你是一个专业的出行推荐官"
+        if self_assess:
+            system_prompt += "\n" + SELF_ASSESSMENT_PROMPT
         messages = [{
             "role": "system",
-            "content": "你是一个专业的出行推荐官"
+            "content": system_prompt
         }]
         messages.extend(message)
+        # 用于本地完整度评分的用户需求
+        request = "\n".join([kwargs.get("summary", "")] + [m["content"] for m in message if m["role"] == "user"])
         
+        stop_marker = SELF_ASSESSMENT_MARKER if self_assess else None
+
         # 获取初始回答
-        result = await qwen_service.create_completion(messages)
+        result = await generate_answer(messages, stop_marker)
         
-        # 判断是否需要追问
-        need_more, followup = await need_followup(result, **kwargs)
-        logger.info(f"need_more: {need_more}, followup: {followup}")
-        # 如果需要追问，将追问内容添加到对话历史
-        while need_more and followup:
+        used_tokens = 0
+        iteration = 0
+        while True:
+            verdict = None
+            if self_assess:
+                result, verdict = split_self_assessment(result)
+
+            # 判断是否需要追问
+            _, followup = await review_answer(result, request, iteration, used_tokens, messages, verdict, **kwargs)
+            if not followup:
+                break
+
+            # 将追问内容添加到对话历史
             messages.extend([
                 {"role": "assistant", "content": result},
                 {"role": "user", "content": followup}
             ])
+            iteration += 1
+            used_tokens += count_message_tokens(messages)
                         
             # 获取新的回答
-            result = await qwen_service.create_completion(messages)
-            
-            # 继续判断是否需要追问
-            need_more, followup = await need_followup(result, **kwargs)
+            emit_event("stage", stage="followup", question=followup)
+            try:
+                result = await generate_answer(messages, stop_marker)
+            except deadline.DeadlineExceeded:
+                logger.warning("追问回答超过截止时间，返回上一轮回答")
+                deadline.mark_partial("followup")
+                break
+            used_tokens += count_tokens(result)
             
         return result
         
@@ -92,7 +236,7 @@ async def search_spot_info(**kwargs) -> str:
         {"role": "assistant", "content": enhanced_summary},
         {"role": "user", "content": f"请详细介绍以下景点的信息（包括门票价格、开放时间、交通方式等实用信息）：{spot_list}"}
     ]
-    return await get_content(messages, summary=summary)
+    return await get_content(messages, tool_name="search_spot_info", summary=summary)
 
 async def spot_recommend(**kwargs) -> str:
     """景点推荐工具"""
@@ -100,12 +244,19 @@ async def spot_recommend(**kwargs) -> str:
     season = kwargs.get('season', '')
     days = kwargs.get('days', '')
     preference = kwargs.get('preference', '')
+    location = kwargs.get('location', '')
+    min_rating = kwargs.get('min_rating')
     
     # 使用 RAG 服务处理 summary
     enhanced_summary = await rag_service.enhance_query(summary, "spot_recommend", 
-                                                     season=season, days=days, preference=preference)
+                                                     season=season, days=days, preference=preference,
+                                                     location=location, min_rating=min_rating)
     
     prompt = "请推荐一些值得游览的景点，"
+    if location:
+        prompt += f"景点位于{location}，"
+    if min_rating:
+        prompt += f"评分不低于{min_rating}，"
     if season:
         prompt += f"考虑{season}季节特点，"
     if days:
@@ -118,7 +269,7 @@ async def spot_recommend(**kwargs) -> str:
         {"role": "assistant", "content": enhanced_summary},
         {"role": "user", "content": prompt}
     ]
-    return await get_content(messages, summary=summary)
+    return await get_content(messages, tool_name="spot_recommend", summary=summary)
 
 async def spot_route_recommend(**kwargs) -> str:
     """路线推荐工具"""
@@ -142,7 +293,7 @@ async def spot_route_recommend(**kwargs) -> str:
         {"role": "assistant", "content": enhanced_summary},
         {"role": "user", "content": prompt}
     ]
-    return await get_content(messages, summary=summary)
+    return await get_content(messages, tool_name="spot_route_recommend", summary=summary)
 
 async def deep_search(**kwargs) -> str:
     """深度搜索工具"""
@@ -161,7 +312,7 @@ async def deep_search(**kwargs) -> str:
         {'role': 'assistant', 'content': enhanced_summary},
         {"role": "user", "content": prompt}
     ]
-    return await get_content(messages, summary=summary)
+    return await get_content(messages, tool_name="deep_search", summary=summary)
 
 async def add_required_spot(**kwargs) -> str:
     """添加必选景点工具"""
@@ -181,7 +332,7 @@ async def add_required_spot(**kwargs) -> str:
         {'role': 'assistant', 'content': enhanced_summary},
         {"role": "user", "content": prompt}
     ]
-    return await get_content(messages, summary=summary)
+    return await get_content(messages, tool_name="add_required_spot", summary=summary)
 
 async def travel_tips(**kwargs) -> str:
     """旅行贴士工具"""
@@ -201,7 +352,7 @@ async def travel_tips(**kwargs) -> str:
         {'role': 'assistant', 'content': enhanced_summary},
         {"role": "user", "content": prompt}
     ]
-    return await get_content(messages, summary=summary)
+    return await get_content(messages, tool_name="travel_tips", summary=summary)
 
 async def general_tool(**kwargs) -> str:
     """通用工具"""
@@ -214,7 +365,7 @@ async def general_tool(**kwargs) -> str:
         {'role': 'assistant', 'content': enhanced_summary},
         {"role": "user", "content": "根据上文回答问题并给出通用解答"}
     ]
-    return await get_content(messages, summary=summary)
+    return await get_content(messages, tool_name="general_tool", summary=summary)
 
 # 工具函数映射表
 tool_funcs = {
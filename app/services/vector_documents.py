@@ -0,0 +1,42 @@
+from app.db.models import Spot, Route
+from typing import Callable, Dict, Tuple
+
+def spot_document(spot: Spot) -> Tuple[int, str, Dict]:
+    """景点的向量索引文档：(record_id, 文本, 元数据)"""
+    content = f"""
+景点名称：{spot.name}
+描述：{spot.description}
+位置：{spot.location}
+标签：{', '.join(spot.tags) if spot.tags else '无'}
+评分：{spot.rating if spot.rating else '暂无评分'}
+    """.strip()
+
+    metadata = {
+        "type": "spot",
+        "name": spot.name,
+        "location": spot.location,
+        "tags": spot.tags,
+        "rating": spot.rating
+    }
+    return spot.id, content, metadata
+
+def route_document(route: Route) -> Tuple[int, str, Dict]:
+    """路线的向量索引文档：(record_id, 文本, 元数据)"""
+    content = f"""
+路线名称：{route.name}
+描述：{route.description}
+包含景点：{', '.join(route.spots) if route.spots else '暂无景点'}
+    """.strip()
+
+    metadata = {
+        "type": "route",
+        "name": route.name,
+        "spots": route.spots
+    }
+    return route.id, content, metadata
+
+# 集合名称 -> (数据表模型, 文档构建函数)
+DOCUMENT_SOURCES: Dict[str, Tuple[type, Callable]] = {
+    "spots": (Spot, spot_document),
+    "routes": (Route, route_document),
+}
@@ -1,141 +1,604 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Callable, Iterable, Optional, Set, Tuple
 from app.core.logger import logger
+from app.core.config import settings
+from app.core import metrics
+from app.services.singleflight import SingleFlight
+from app.services.rwlock import ReadWriteLock
+from app.services.index_snapshot import IndexSnapshotStore, SNAPSHOT_VERSION
+from app.services.index_factory import (
+    IndexConfig, exact_search, index_type, live_vectors, remove_ids, tombstone_count, uses_tombstones
+)
+from app.services.attribute_index import AttributeIndex
+from app.services.vector_documents import DOCUMENT_SOURCES
+from app.db.crud import register_change_listener
 from app.db.session import Session
+from sqlalchemy.orm import Session as SQLAlchemySession
 from app.db.models import VectorIndex, Spot, Route, ChatHistory
+from sqlalchemy import func
 import numpy as np
-from sentence_transformers import SentenceTransformer
 import faiss
+import hashlib
+from itertools import islice
 import json
+import asyncio
+import threading
+import time
 
 class VectorStore:
     """向量存储服务"""
     
+    # 预热时编码的示例文本，覆盖单条和批量编码
+    WARMUP_TEXTS = ["故宫", "北京有哪些值得去的历史景点？", "适合秋天三日游的自然风光路线"]
+
     def __init__(self):
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
+        # 向量模型在首次使用时加载（见 model），导入本模块不再加载 torch 和模型
+        self._model = None
+        self._model_lock = threading.Lock()
         self.dimension = 384  # 向量维度
         self.indices = {}  # 集合名称 -> FAISS索引的映射
+        self.configs: Dict[str, IndexConfig] = {}  # 集合名称 -> 索引类型配置
+        # 集合名称 -> {record_id: metadata}，与索引同步更新；索引以 record_id 为 ID，
+        # 检索结果直接映射到元数据，不再查询数据库
+        self.metadata: Dict[str, Dict[int, Dict]] = {}
+        self.attributes: Dict[str, AttributeIndex] = {}  # 集合名称 -> 元数据倒排索引，用于过滤检索
+        self._tombstones: Dict[str, int] = {}  # 集合名称 -> HNSW 索引中已删除但未清理的向量数
+        # 保护索引与元数据：检索持有读锁可并行执行，加载和更新持有写锁
+        self._index_lock = ReadWriteLock()
+        # 索引快照：启动时以内存映射方式加载，数据库有变化时重建
+        self.snapshots = IndexSnapshotStore(
+            settings.VECTOR_INDEX_DIR, mmap=settings.VECTOR_INDEX_MMAP
+        ) if settings.VECTOR_INDEX_DIR else None
+        self._mapped: Set[str] = set()  # 以内存映射方式加载（只读）的集合
+        self._dirty: Set[str] = set()  # 快照保存后又有变更的集合
+        # 集合名称 -> 内存索引加载或重建时的数据库校验值，保存快照时据此判断索引是否仍与数据库一致
+        self._synced: Dict[str, str] = {}
+        self.singleflight = SingleFlight("vector_search") if settings.SINGLEFLIGHT_ENABLED else None
+        metrics.registry.register_collector(self._collect_metrics)
         
     def init_index(self, collection_name: str):
         """初始化FAISS索引"""
         if collection_name not in self.indices:
-            index = faiss.IndexFlatL2(self.dimension)
+            index = self.get_config(collection_name).build(
+                self.dimension, np.empty((0, self.dimension), dtype=np.float32), np.empty(0, dtype=np.int64)
+            )
             self.indices[collection_name] = index
+            self.metadata[collection_name] = {}
+            self.attributes[collection_name] = AttributeIndex()
+            self._tombstones[collection_name] = 0
             logger.info(f"创建向量索引: {collection_name}")
+
+    def get_config(self, collection_name: str) -> IndexConfig:
+        """集合的索引类型配置"""
+        if collection_name not in self.configs:
+            self.configs[collection_name] = IndexConfig.for_collection(collection_name)
+        return self.configs[collection_name]
             
+    @property
+    def model(self):
+        """向量模型，首次访问时加载"""
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    start = time.perf_counter()
+                    from sentence_transformers import SentenceTransformer
+                    self._model = SentenceTransformer(settings.EMBEDDING_MODEL_NAME)
+                    logger.info(f"加载向量模型: {settings.EMBEDDING_MODEL_NAME}, 耗时 {time.perf_counter() - start:.2f}s")
+        return self._model
+
+    @property
+    def model_loaded(self) -> bool:
+        return self._model is not None
+
+    def warmup(self) -> float:
+        """加载模型并编码示例文本，使首次检索不承担加载和首次推理的开销，返回耗时（秒）"""
+        start = time.perf_counter()
+        self.get_embedding(self.WARMUP_TEXTS[0])
+        self.get_embeddings(self.WARMUP_TEXTS)
+        elapsed = time.perf_counter() - start
+        logger.info(f"向量模型预热完成, 耗时 {elapsed:.2f}s")
+        return elapsed
+
     def get_embedding(self, text: str) -> np.ndarray:
         """获取文本的向量嵌入"""
-        return self.model.encode(text)
+        with metrics.stage("embedding"):
+            return self.model.encode(text)
+
+    def get_embeddings(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        """批量获取文本的向量嵌入，返回 (len(texts), dimension) 的矩阵"""
+        with metrics.stage("embedding"):
+            vectors = self.model.encode(list(texts), batch_size=batch_size)
+            return np.asarray(vectors, dtype=np.float32).reshape(len(texts), self.dimension)
         
     def add_to_index(self, collection_name: str, record_id: int, text: str, metadata: Dict = None):
-        """添加记录到向量索引"""
+        """添加记录到向量索引，记录已存在时更新"""
+        self.upsert(collection_name, record_id, text, metadata)
+
+    def upsert(self, collection_name: str, record_id: int, text: str, metadata: Dict = None):
+        """添加或更新一条记录：只编码这一条，替换数据库和索引中的旧向量"""
         try:
             # 获取向量嵌入
             vector = self.get_embedding(text)
             
-            # 确保索引存在
-            self.init_index(collection_name)
-            
-            # 添加到FAISS索引
-            self.indices[collection_name].add(np.array([vector]))
-            
-            # 保存到数据库
+            # 保存到数据库，已有记录时原地更新
             with Session() as session:
-                vector_index = VectorIndex(
-                    collection_name=collection_name,
-                    record_id=record_id,
-                    vector=vector.tolist(),  # 转换为列表以便JSON序列化
-                    meta_info=metadata or {}
-                )
-                session.add(vector_index)
-                session.commit()
+                rows = session.query(VectorIndex).filter(
+                    VectorIndex.collection_name == collection_name,
+                    VectorIndex.record_id == record_id
+                ).order_by(VectorIndex.id).all()
+                if rows:
+                    rows[0].vector = vector
+                    rows[0].meta_info = metadata or {}
+                    for duplicate in rows[1:]:
+                        session.delete(duplicate)
+                else:
+                    session.add(VectorIndex(
+                        collection_name=collection_name,
+                        record_id=record_id,
+                        vector=vector,  # 以 float32 字节存储
+                        meta_info=metadata or {}
+                    ))
+
+            # 替换索引中的向量；索引尚未加载时从数据库加载（已包含本条记录）
+            with self._index_lock.write():
+                if collection_name not in self.indices:
+                    self.load_index(collection_name)
+                else:
+                    self._remove_ids(collection_name, [record_id])
+                    self._writable_index(collection_name).add_with_ids(
+                        np.asarray([vector], dtype=np.float32), np.asarray([record_id], dtype=np.int64)
+                    )
+                    self.metadata[collection_name][record_id] = metadata or {}
+                    self.attributes[collection_name].add(record_id, metadata or {})
+                    self._dirty.add(collection_name)
+                    self._train_if_needed(collection_name)
                 
-            logger.info(f"添加向量索引记录: {collection_name}/{record_id}")
+            logger.info(f"更新向量索引记录: {collection_name}/{record_id}")
             
         except Exception as e:
-            logger.error(f"添加向量索引失败: {str(e)}")
+            logger.error(f"更新向量索引失败: {str(e)}")
+            raise
+
+    def remove(self, collection_name: str, record_ids: List[int]):
+        """从数据库和索引中删除记录"""
+        record_ids = list(record_ids)
+        if not record_ids:
+            return
+        try:
+            with Session() as session:
+                session.query(VectorIndex).filter(
+                    VectorIndex.collection_name == collection_name,
+                    VectorIndex.record_id.in_(record_ids)
+                ).delete(synchronize_session=False)
+
+            with self._index_lock.write():
+                if collection_name in self.indices:
+                    self._remove_ids(collection_name, record_ids)
+                    self._dirty.add(collection_name)
+
+            logger.info(f"删除向量索引记录: {collection_name}/{record_ids}")
+
+        except Exception as e:
+            logger.error(f"删除向量索引失败: {str(e)}")
             raise
+
+    def add_many(
+        self,
+        collection_name: str,
+        records: Iterable[Tuple[int, str, Dict]],
+        session: Optional[SQLAlchemySession] = None,
+        progress: Optional[Callable[[int], None]] = None
+    ) -> int:
+        """批量添加记录到向量索引
+
+        按 VECTOR_INSERT_CHUNK_SIZE 分块：每块批量编码，并在一个事务中批量写入数据库；
+        全部写入后一次性添加到 FAISS 索引。用于写入新记录，已存在的记录请使用 upsert。
+
+        Args:
+            records: (record_id, 文本, 元数据)，可以是生成器，按块读取
+            session: 写入使用的数据库会话，为空时每块新开会话。调用方以 yield_per 流式读取时
+                需传入读取所用的会话（SQLite 在读游标打开期间不允许其他连接提交）
+            progress: 每写入一块后以累计记录数回调
+
+        Returns:
+            添加的记录数
+        """
+        records = iter(records)
+        vectors: List[np.ndarray] = []
+        entries: List[Tuple[int, Dict]] = []
+        try:
+            while True:
+                chunk = list(islice(records, settings.VECTOR_INSERT_CHUNK_SIZE))
+                if not chunk:
+                    break
+                chunk_vectors = self.get_embeddings(
+                    [text for _, text, _ in chunk], batch_size=settings.VECTOR_ENCODE_BATCH_SIZE
+                )
+                rows = [
+                    {
+                        "collection_name": collection_name,
+                        "record_id": record_id,
+                        "vector": vector,
+                        "meta_info": metadata or {}
+                    }
+                    for (record_id, _, metadata), vector in zip(chunk, chunk_vectors)
+                ]
+                if session is None:
+                    with Session() as chunk_session:
+                        chunk_session.bulk_insert_mappings(VectorIndex, rows)
+                else:
+                    session.bulk_insert_mappings(VectorIndex, rows)
+                    session.commit()
+
+                vectors.append(chunk_vectors)
+                entries.extend((record_id, metadata or {}) for record_id, _, metadata in chunk)
+                if progress is not None:
+                    progress(len(entries))
+
+        except Exception as e:
+            logger.error(f"批量添加向量索引失败: {str(e)}")
+            if entries:
+                # 已写入数据库的记录不在内存索引中，丢弃索引，下次检索时重新加载
+                with self._index_lock.write():
+                    self._drop_index(collection_name)
+            raise
+
+        if not entries:
+            return 0
+
+        # 添加到FAISS索引和元数据；索引尚未加载时从数据库加载（已包含本批记录）
+        with self._index_lock.write():
+            if collection_name not in self.indices:
+                self.load_index(collection_name)
+            else:
+                self._writable_index(collection_name).add_with_ids(
+                    np.vstack(vectors), np.asarray([record_id for record_id, _ in entries], dtype=np.int64)
+                )
+                self.metadata[collection_name].update(entries)
+                for record_id, metadata in entries:
+                    self.attributes[collection_name].add(record_id, metadata)
+                self._dirty.add(collection_name)
+                self._train_if_needed(collection_name)
+
+        logger.info(f"批量添加向量索引记录: {collection_name}, {len(entries)} 条")
+        return len(entries)
             
-    def search(self, collection_name: str, query: str, k: int = 5) -> List[Dict]:
-        """搜索最相似的记录"""
+    def search(self, collection_name: str, query: str, k: int = 5, **search_params) -> List[Dict]:
+        """搜索最相似的记录
+
+        search_params 可指定：
+        - nprobe（IVF 索引）或 ef_search（HNSW 索引），默认使用集合配置
+        - filter: 元数据过滤条件，如 {"location": "北京", "tags": ["历史"], "min_rating": 4.5}，
+          只返回满足条件的记录，满足条件的记录不少于 k 条时返回 k 条
+        """
+        with metrics.stage("vector_search"):
+            return self._search(collection_name, [query], k, **search_params)[0]
+
+    def search_many(self, collection_name: str, queries: List[str], k: int = 5, **search_params) -> List[List[Dict]]:
+        """批量搜索：一次编码所有查询并执行一次 FAISS 批量搜索，结果与 queries 一一对应"""
+        if not queries:
+            return []
+        with metrics.stage("vector_search"):
+            return self._search(collection_name, list(queries), k, **search_params)
+
+    def _search(self, collection_name: str, queries: List[str], k: int, **search_params) -> List[List[Dict]]:
         try:
             # 获取查询向量
-            query_vector = self.get_embedding(query)
+            query_vectors = self.get_embeddings(queries)
+            return self._search_vectors(collection_name, query_vectors, k, **search_params)
             
-            # 检查数据库中的记录数量
-            with Session() as session:
-                record_count = session.query(VectorIndex).filter(
-                    VectorIndex.collection_name == collection_name
-                ).count()
-                
-                if record_count == 0:
-                    logger.warning(f"集合 {collection_name} 中没有记录")
-                    return []
-                    
-                # 如果索引不存在，从数据库重建索引
+        except Exception as e:
+            logger.error(f"向量搜索失败: {str(e)}")
+            raise
+
+    def _search_vectors(
+        self,
+        collection_name: str,
+        query_vectors: np.ndarray,
+        k: int,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[List[Dict]]:
+        """用查询向量检索，FAISS 返回的 ID 即 record_id，直接映射到元数据，耗时只与 k 有关
+
+        检索持有读锁，多个检索（FAISS 检索期间释放 GIL）可以并行执行，只与索引的写入互斥
+        """
+        search_args = (collection_name, query_vectors, k, nprobe, ef_search, filter)
+        with self._index_lock.read():
+            loaded = collection_name in self.indices
+            if loaded:
+                all_results = self._search_loaded(*search_args)
+        if not loaded:
+            # 索引不存在时加写锁，从快照或数据库加载后检索
+            with self._index_lock.write():
                 if collection_name not in self.indices:
-                    logger.info(f"从数据库重建集合 {collection_name} 的索引")
-                    self.rebuild_index(collection_name)
-            
-            # 执行搜索
-            D, I = self.indices[collection_name].search(
-                np.array([query_vector]), 
-                min(k, record_count)  # 确保k不超过记录数量
+                    self.load_index(collection_name)
+                all_results = self._search_loaded(*search_args)
+
+        if all_results is None:
+            # 空集合不缓存，之后写入的记录在下次检索时加载
+            with self._index_lock.write():
+                if not self.metadata.get(collection_name):
+                    self._drop_index(collection_name)
+            logger.warning(f"集合 {collection_name} 中没有记录")
+            return [[] for _ in range(len(query_vectors))]
+
+        logger.info(f"向量搜索结果 [{collection_name}]: {all_results}")
+        return all_results
+
+    def _search_loaded(
+        self,
+        collection_name: str,
+        query_vectors: np.ndarray,
+        k: int,
+        nprobe: Optional[int],
+        ef_search: Optional[int],
+        filter: Optional[Dict[str, Any]]
+    ) -> Optional[List[List[Dict]]]:
+        """在已加载的索引中检索，需持有索引锁；结果在锁内映射到元数据，集合为空时返回 None"""
+        index = self.indices[collection_name]
+        metadata = self.metadata[collection_name]
+        if not metadata:
+            return None
+
+        config = self.get_config(collection_name)
+        mask = self.attributes[collection_name].match(filter) if filter else None
+        matched = int(np.count_nonzero(mask)) if mask is not None else 0
+        if mask is None:
+            # 执行搜索；已删除（墓碑）的向量仍可能被返回，多取相应数量后跳过
+            D, I = index.search(
+                query_vectors,
+                min(k + self._tombstones.get(collection_name, 0), index.ntotal),  # 确保k不超过记录数量
+                params=config.search_params(index, nprobe, ef_search)
             )
-            
-            # 获取结果
+        elif matched == 0:
+            return [[] for _ in range(len(query_vectors))]
+        else:
+            D, I = self._filtered_search(
+                index, config, query_vectors, min(k, matched), mask, matched, nprobe, ef_search
+            )
+
+        # 使用FAISS返回的 record_id 获取对应的元数据
+        all_results = []
+        for distances, labels in zip(D, I):
             results = []
-            with Session() as session:
-                # 获取该集合的所有向量索引记录
-                vector_indices = session.query(VectorIndex).filter(
-                    VectorIndex.collection_name == collection_name
-                ).all()
-                
-                # 使用FAISS返回的索引位置获取对应的记录
-                for i, (distance, idx) in enumerate(zip(D[0], I[0])):
-                    if idx < 0 or idx >= len(vector_indices):  # FAISS返回-1表示无效结果
+            for distance, label in zip(distances, labels):
+                item = metadata.get(int(label)) if label >= 0 else None
+                if item is None:  # FAISS返回-1表示无效结果，不在元数据中表示已删除
+                    continue
+
+                results.append({
+                    "record_id": int(label),
+                    "distance": float(distance),
+                    "metadata": item
+                })
+                if len(results) == k:
+                    break
+            all_results.append(results)
+        return all_results
+
+    @staticmethod
+    def _filtered_search(
+        index: faiss.Index,
+        config: IndexConfig,
+        query_vectors: np.ndarray,
+        k: int,
+        mask: np.ndarray,
+        matched: int,
+        nprobe: Optional[int],
+        ef_search: Optional[int]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """只在位图 mask 中的记录内检索：记录较少时直接精确计算，否则使用 FAISS ID 选择器"""
+        if config.use_exact_filter(index, matched):
+            return exact_search(index, query_vectors, k, mask)
+        D, I = index.search(query_vectors, k, params=config.search_params(index, nprobe, ef_search, mask))
+        # 近似索引在过滤条件下可能找不到 k 条结果，这些查询改为精确检索
+        short = np.flatnonzero((I >= 0).sum(axis=1) < k)
+        if len(short):
+            D[short], I[short] = exact_search(index, query_vectors[short], k, mask)
+        return D, I
+
+    async def asearch(self, collection_name: str, query: str, k: int = 5, **search_params) -> List[Dict]:
+        """异步搜索：在线程池中执行，并合并并发的相同检索"""
+        call = lambda: asyncio.to_thread(self.search, collection_name, query, k, **search_params)
+        if self.singleflight is None:
+            return await call()
+        return await self.singleflight.do(
+            (collection_name, query, k, self._params_key(search_params)), call
+        )
+
+    async def asearch_many(self, collection_name: str, queries: List[str], k: int = 5, **search_params) -> List[List[Dict]]:
+        """异步批量搜索：在线程池中执行，并合并并发的相同检索"""
+        queries = list(queries)
+        if not queries:
+            return []
+        call = lambda: asyncio.to_thread(self.search_many, collection_name, queries, k, **search_params)
+        if self.singleflight is None:
+            return await call()
+        return await self.singleflight.do(
+            (collection_name, tuple(queries), k, self._params_key(search_params)), call
+        )
+
+    @staticmethod
+    def _params_key(search_params: Dict[str, Any]) -> str:
+        """检索参数（可能包含过滤条件字典）的可哈希表示，用于合并相同的检索"""
+        return json.dumps(search_params, sort_keys=True, ensure_ascii=False, default=str)
+
+    def _collect_metrics(self):
+        """导出合并检索统计"""
+        if self.singleflight is not None:
+            stats = self.singleflight.stats()
+            yield "travel_singleflight_deduplicated", "Calls served by a shared in-flight execution", {"name": "vector_search"}, stats["deduplicated"]
+            yield "travel_singleflight_executions", "Executions started by single-flight groups", {"name": "vector_search"}, stats["executions"]
+
+    def load_index(self, collection_name: str):
+        """加载集合索引：快照与数据库一致时以内存映射方式加载快照，否则从数据库重建"""
+        with self._index_lock.write():
+            if self.snapshots is not None:
+                with Session() as session:
+                    checksum = self._checksum(session, collection_name)
+                snapshot = self.snapshots.load(collection_name, checksum)
+                if snapshot is not None:
+                    self.indices[collection_name], self.metadata[collection_name] = snapshot
+                    self._synced[collection_name] = checksum
+                    self.attributes[collection_name] = AttributeIndex.build(self.metadata[collection_name])
+                    self._tombstones[collection_name] = tombstone_count(self.indices[collection_name])
+                    if self.snapshots.mmap:
+                        self._mapped.add(collection_name)
+                    self._dirty.discard(collection_name)
+                    return
+            logger.info(f"从数据库重建集合 {collection_name} 的索引")
+            self.rebuild_index(collection_name)
+
+    def preload(self, collection_names: List[str]):
+        """预先加载各集合的索引（服务启动时调用）"""
+        for collection_name in collection_names:
+            try:
+                self.load_index(collection_name)
+            except Exception as e:
+                logger.error(f"预加载向量索引失败 [{collection_name}]: {str(e)}")
+
+    def save_snapshots(self):
+        """保存有变更的集合的快照（服务关闭时调用）"""
+        if self.snapshots is None:
+            return
+        with self._index_lock.write():
+            for collection_name in list(self._dirty):
+                try:
+                    with Session() as session:
+                        checksum = self._checksum(session, collection_name)
+                    # 数据库在加载或重建之后有写入（本进程或其他工作进程），内存索引不一定包含
+                    # 其他进程的写入，不能以当前校验值保存；从数据库重建（重建时保存快照）
+                    if checksum != self._synced.get(collection_name):
+                        logger.info(f"集合 {collection_name} 在加载后有写入，从数据库重建后保存快照")
+                        self.rebuild_index(collection_name)
                         continue
-                        
-                    vector_index = vector_indices[idx]
-                    results.append({
-                        "record_id": vector_index.record_id,
-                        "distance": float(distance),
-                        "metadata": vector_index.meta_info
-                    })
-                    
-            logger.info(f"向量搜索结果 [{collection_name}]: {results}")
-            return results
-            
-        except Exception as e:
-            logger.error(f"向量搜索失败: {str(e)}")
-            raise
-            
+                    self.snapshots.save(
+                        collection_name, self.indices[collection_name], self.metadata[collection_name], checksum
+                    )
+                    self._dirty.discard(collection_name)
+                except Exception as e:
+                    logger.error(f"保存向量索引快照失败 [{collection_name}]: {str(e)}")
+
+    def _checksum(self, session, collection_name: str) -> str:
+        """集合在数据库中的校验值：记录数、最大ID、最近更新时间和索引配置，任一变化都会使快照失效"""
+        count, max_id, last_updated = session.query(
+            func.count(VectorIndex.id), func.max(VectorIndex.id), func.max(VectorIndex.updated_at)
+        ).filter(VectorIndex.collection_name == collection_name).one()
+        payload = json.dumps([
+            SNAPSHOT_VERSION, self.dimension, count, max_id, str(last_updated),
+            self.get_config(collection_name).signature()
+        ])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _writable_index(self, collection_name: str) -> faiss.Index:
+        """内存映射加载的索引是只读的，写入前复制到内存"""
+        if collection_name in self._mapped:
+            index = self.indices[collection_name]
+            self.indices[collection_name] = faiss.deserialize_index(faiss.serialize_index(index))
+            self._mapped.discard(collection_name)
+        return self.indices[collection_name]
+
+    def _drop_index(self, collection_name: str):
+        """丢弃内存中的索引，下次检索时重新加载"""
+        self.indices.pop(collection_name, None)
+        self.metadata.pop(collection_name, None)
+        self.attributes.pop(collection_name, None)
+        self._tombstones.pop(collection_name, None)
+        self._mapped.discard(collection_name)
+        self._synced.pop(collection_name, None)
+
+    def _remove_ids(self, collection_name: str, record_ids: List[int]):
+        """从索引和元数据中删除记录；HNSW 的墓碑过多时重建索引"""
+        index = self._writable_index(collection_name)
+        removed = remove_ids(index, record_ids)
+        for record_id in record_ids:
+            metadata = self.metadata[collection_name].pop(record_id, None)
+            if metadata is not None:
+                self.attributes[collection_name].remove(record_id, metadata)
+        if not uses_tombstones(index):
+            return
+        self._tombstones[collection_name] = self._tombstones.get(collection_name, 0) + removed
+        if self.get_config(collection_name).needs_compaction(index, self._tombstones[collection_name]):
+            vectors, ids = live_vectors(index)
+            self.indices[collection_name] = self.get_config(collection_name).build(self.dimension, vectors, ids)
+            self._tombstones[collection_name] = 0
+            logger.info(f"清理集合 {collection_name} 的已删除向量，剩余 {len(ids)} 条记录")
+
+    def _train_if_needed(self, collection_name: str):
+        """记录数达到阈值时，用 Flat 索引中的向量训练并构建配置的近似索引"""
+        config = self.get_config(collection_name)
+        index = self.indices[collection_name]
+        if not config.needs_training(index):
+            return
+        vectors, ids = live_vectors(index)
+        self.indices[collection_name] = config.build(self.dimension, vectors, ids)
+        self._mapped.discard(collection_name)
+        self._dirty.add(collection_name)
+        logger.info(f"集合 {collection_name} 达到 {index.ntotal} 条记录，切换为 {config.type} 索引")
+
     def rebuild_index(self, collection_name: str):
         """重建向量索引"""
         try:
-            # 清除现有索引
-            if collection_name in self.indices:
-                del self.indices[collection_name]
-            
-            # 初始化新索引
-            self.init_index(collection_name)
-            
-            # 从数据库加载所有记录
+            # 从数据库加载所有记录，按写入顺序排列，元数据与向量来自同一次查询
             with Session() as session:
-                vectors = session.query(VectorIndex).filter(
+                checksum = self._checksum(session, collection_name)
+                rows = session.query(
+                    VectorIndex.record_id, VectorIndex.vector, VectorIndex.meta_info
+                ).filter(
                     VectorIndex.collection_name == collection_name
-                ).all()
-                
-                if vectors:
-                    # 重建FAISS索引
-                    all_vectors = np.array([np.array(v.vector) for v in vectors])
-                    self.indices[collection_name].add(all_vectors)
-                    logger.info(f"重建向量索引完成: {collection_name}, 添加了 {len(vectors)} 条记录")
-                else:
-                    logger.warning(f"集合 {collection_name} 中没有记录，无法重建索引")
+                ).order_by(VectorIndex.id).all()
+
+            # 同一 record_id 有多条记录时以最后写入的为准
+            latest = {row.record_id: row for row in rows}
+            metadata = {record_id: row.meta_info or {} for record_id, row in latest.items()}
+            attributes = AttributeIndex.build(metadata)
+
+            # 构建新索引后整体替换，替换前的检索不受影响
+            # 每行向量由 np.frombuffer 直接映射，只在合并为矩阵时复制一次
+            vectors = np.vstack([row.vector for row in latest.values()]) if latest else np.empty((0, self.dimension), dtype=np.float32)
+            index = self.get_config(collection_name).build(
+                self.dimension, vectors, np.fromiter(latest.keys(), dtype=np.int64, count=len(latest))
+            )
+            if rows:
+                logger.info(f"重建向量索引完成: {collection_name}, 类型 {index_type(index)}, 添加了 {len(latest)} 条记录")
+            else:
+                logger.warning(f"集合 {collection_name} 中没有记录，无法重建索引")
+
+            with self._index_lock.write():
+                self.indices[collection_name] = index
+                self.metadata[collection_name] = metadata
+                self.attributes[collection_name] = attributes
+                self._tombstones[collection_name] = 0
+                self._mapped.discard(collection_name)
+                self._dirty.discard(collection_name)
+                self._synced[collection_name] = checksum
+
+            if self.snapshots is not None and rows:
+                self.snapshots.save(collection_name, index, metadata, checksum)
             
         except Exception as e:
             logger.error(f"重建向量索引失败: {str(e)}")
             raise
 
+    def _on_change(self, collection: str, action: str, record_id: int):
+        """景点/路线变更时只重新编码变更的记录"""
+        if collection not in DOCUMENT_SOURCES:
+            return
+        document = None
+        if action != "delete":
+            model, build_document = DOCUMENT_SOURCES[collection]
+            with Session() as session:
+                row = session.get(model, record_id)
+                if row is not None:
+                    document = build_document(row)
+
+        if document is None:
+            self.remove(collection, [record_id])
+        else:
+            self.upsert(collection, *document)
+
 # 创建向量存储实例
-vector_store = VectorStore() 
\ No newline at end of file
+vector_store = VectorStore()
+if settings.VECTOR_SYNC_ENABLED:
+    register_change_listener(vector_store._on_change) 
\ No newline at end of file
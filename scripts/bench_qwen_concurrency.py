@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+"""
+Qwen 客户端并发吞吐基准测试
+
+在本地启动一个模拟的 OpenAI 兼容接口（每次请求固定延迟），分别测量：
+- 改造前：在协程中调用同步 OpenAI 客户端（阻塞事件循环）
+- 改造后：QwenService 的异步客户端 + 连接池
+
+用法：
+    python scripts/bench_qwen_concurrency.py --requests 50 --concurrency 50 --latency 0.2
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from openai import OpenAI
+
+def make_handler(latency: float):
+    class FakeCompletionHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # 支持 keep-alive
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            self.rfile.read(length)
+            time.sleep(latency)
+            body = json.dumps({
+                "id": "chatcmpl-bench",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": "bench",
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "ok"},
+                    "finish_reason": "stop"
+                }],
+                "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}
+            }).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return FakeCompletionHandler
+
+def start_fake_server(latency: float) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(latency))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+async def run_concurrent(call, total: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            await call()
+
+    start = time.perf_counter()
+    await asyncio.gather(*[one() for _ in range(total)])
+    return time.perf_counter() - start
+
+async def main(args):
+    server = start_fake_server(args.latency)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    messages = [{"role": "user", "content": "你好"}]
+
+    # 改造前：协程内调用同步客户端
+    sync_client = OpenAI(base_url=base_url, api_key="none")
+
+    async def blocking_call():
+        sync_client.chat.completions.create(model="bench", messages=messages, max_tokens=16)
+
+    # 改造后：异步客户端 + 连接池
+    from app.core.config import settings
+    settings.QWEN_API_URL = base_url
+    settings.QWEN_MAX_CONNECTIONS = args.concurrency
+    settings.QWEN_MAX_KEEPALIVE_CONNECTIONS = args.concurrency
+    from app.services.qwen_service import QwenService
+    service = QwenService()
+
+    async def async_call():
+        await service.create_completion(messages, max_tokens=16)
+
+    # 预热连接
+    await blocking_call()
+    await async_call()
+
+    results = {}
+    for name, call in (("sync (before)", blocking_call), ("async pooled (after)", async_call)):
+        elapsed = await run_concurrent(call, args.requests, args.concurrency)
+        results[name] = elapsed
+        print(f"{name:<22} {args.requests} 请求, 并发 {args.concurrency}: "
+              f"{elapsed:.2f}s, 吞吐 {args.requests / elapsed:.1f} req/s")
+
+    before, after = results["sync (before)"], results["async pooled (after)"]
+    print(f"加速比: {before / after:.1f}x")
+
+    await service.close()
+    sync_client.close()
+    server.shutdown()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Qwen 客户端并发吞吐基准测试")
+    parser.add_argument("--requests", type=int, default=50, help="请求总数")
+    parser.add_argument("--concurrency", type=int, default=50, help="并发数")
+    parser.add_argument("--latency", type=float, default=0.2, help="模拟接口延迟（秒）")
+    asyncio.run(main(parser.parse_args()))
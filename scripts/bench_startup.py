@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+"""
+启动耗时基准测试
+
+每次测量在新的 Python 进程中执行，比较向量模型的几种加载方式：
+- import: 只导入 app.core.tools（会间接导入向量存储），检查是否加载了 torch / sentence_transformers
+- eager: 导入后立即加载模型（改造前导入时即加载的行为），再预加载索引
+- lazy: 导入并预加载索引后直接检索，由首次检索加载模型
+- warmup: 导入、预加载索引并预热模型（与应用 lifespan 相同）后检索
+
+报告各项耗时的中位数：进程总耗时、导入耗时、就绪耗时（可以接收请求）、首次 / 第二次检索耗时，
+以及从开始导入到拿到首次检索结果的冷启动耗时。
+
+用法：
+    python scripts/bench_startup.py --records 1000 --repeat 3
+"""
+import sys
+import os
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import json
+import statistics
+import subprocess
+import time
+
+COLLECTION = "bench"
+QUERY = "北京有哪些值得去的历史景点？"
+PHASES = ["import", "eager", "lazy", "warmup"]
+RESULT_PREFIX = "RESULT "
+
+def run_phase(phase: str, k: int) -> dict:
+    """子进程中执行：测量导入、就绪和检索耗时"""
+    start = time.perf_counter()
+    import app.core.tools  # noqa: F401
+    from app.services.vector_store import vector_store
+    result = {
+        "import_s": time.perf_counter() - start,
+        "sentence_transformers_imported": "sentence_transformers" in sys.modules,
+        "torch_imported": "torch" in sys.modules,
+    }
+    if phase == "import":
+        return result
+
+    if phase == "eager":
+        vector_store.model
+    vector_store.preload([COLLECTION])
+    if phase == "warmup":
+        vector_store.warmup()
+    result["ready_s"] = time.perf_counter() - start
+
+    for name in ("first_search_ms", "second_search_ms"):
+        search_start = time.perf_counter()
+        vector_store.search(COLLECTION, QUERY, k)
+        result[name] = (time.perf_counter() - search_start) * 1000
+        if name == "first_search_ms":
+            result["first_result_s"] = time.perf_counter() - start
+    return result
+
+def populate(records: int):
+    """写入随机向量记录并保存索引快照，子进程启动时从快照加载"""
+    import numpy as np
+    from app.db.base import Base
+    from app.db.models import VectorIndex
+    from app.db.session import Session, engine
+    from app.services.vector_store import vector_store
+
+    Base.metadata.drop_all(bind=engine, tables=[VectorIndex.__table__])
+    Base.metadata.create_all(bind=engine, tables=[VectorIndex.__table__])
+    vectors = np.random.default_rng(0).standard_normal((records, vector_store.dimension)).astype(np.float32)
+    with Session() as session:
+        session.bulk_insert_mappings(VectorIndex, [
+            {
+                "collection_name": COLLECTION,
+                "record_id": i,
+                "vector": vector,
+                "meta_info": {"name": f"spot-{i}"}
+            }
+            for i, vector in enumerate(vectors)
+        ])
+    vector_store.rebuild_index(COLLECTION)
+
+def measure(phase: str, k: int) -> dict:
+    """在新进程中执行一次测量"""
+    start = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--phase", phase, "--k", str(k)],
+        capture_output=True, text=True, check=True
+    )
+    process_s = time.perf_counter() - start
+    line = next(l for l in completed.stdout.splitlines() if l.startswith(RESULT_PREFIX))
+    return {"process_s": process_s, **json.loads(line[len(RESULT_PREFIX):])}
+
+def summarize(runs) -> dict:
+    summary = {}
+    for key, value in runs[0].items():
+        if isinstance(value, bool):
+            summary[key] = value
+        else:
+            summary[key] = round(statistics.median(run[key] for run in runs), 3)
+    return summary
+
+def main(args):
+    if args.phase:
+        print(RESULT_PREFIX + json.dumps(run_phase(args.phase, args.k)))
+        return
+
+    # 使用临时数据库和快照目录，子进程通过环境变量继承
+    bench_dir = tempfile.mkdtemp(prefix="bench_startup_")
+    os.environ.setdefault("SQLALCHEMY_DATABASE_URI", f"sqlite:///{os.path.join(bench_dir, 'bench.db')}")
+    os.environ.setdefault("SQL_ECHO", "false")
+    os.environ["VECTOR_INDEX_DIR"] = os.path.join(bench_dir, "index")
+    populate(args.records)
+
+    report = []
+    for phase in PHASES:
+        result = {"phase": phase, **summarize([measure(phase, args.k) for _ in range(args.repeat)])}
+        report.append(result)
+        print(json.dumps(result, ensure_ascii=False))
+
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="启动耗时基准测试")
+    parser.add_argument("--records", type=int, default=1000, help="集合中的记录数")
+    parser.add_argument("--repeat", type=int, default=3, help="每种方式的测量次数，取中位数")
+    parser.add_argument("--k", type=int, default=5, help="每次检索返回的记录数")
+    parser.add_argument("--phase", choices=PHASES, help="内部使用：在子进程中执行单项测量")
+    main(parser.parse_args())
@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+"""
+过滤检索基准测试
+
+在临时 SQLite 数据库中写入带元数据（地点、标签、评分）的合成向量记录（高斯簇），对每种索引类型
+（Flat、IVF-Flat、HNSW）和不同选择度的过滤条件，比较：
+- 过滤检索：search(..., filter=...)，通过倒排索引和 FAISS ID 选择器只在满足条件的记录中检索
+- 检索后过滤：先取不带过滤的 top-k 再按条件筛选（改造前只能由大模型在结果中挑选）
+
+报告 p50 / p99 延迟、相对精确过滤结果的 recall@k，以及返回满 k 条结果的查询比例。
+
+用法：
+    python scripts/bench_vector_filter.py --size 100000 --queries 200 --k 10
+"""
+import sys
+import os
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 使用临时数据库并关闭快照，需在导入 app 模块前设置
+_BENCH_DB = os.path.join(tempfile.mkdtemp(prefix="bench_filter_"), "bench.db")
+os.environ.setdefault("SQLALCHEMY_DATABASE_URI", f"sqlite:///{_BENCH_DB}")
+os.environ.setdefault("SQL_ECHO", "false")
+os.environ["VECTOR_INDEX_DIR"] = ""
+
+import argparse
+import json
+import statistics
+import time
+
+import faiss
+import numpy as np
+
+from app.db.base import Base
+from app.db.models import VectorIndex
+from app.db.session import Session, engine
+from app.services.index_factory import IndexConfig
+from app.services.vector_store import vector_store
+
+COLLECTION = "bench"
+INSERT_CHUNK = 10000
+CITIES = 100
+TAGS = [f"标签{i:02d}" for i in range(50)]
+
+INDEX_CONFIGS = [
+    ("flat", {"type": "flat"}),
+    ("ivf_flat", {"type": "ivf_flat", "train_threshold": 0}),
+    ("hnsw", {"type": "hnsw", "train_threshold": 0}),
+]
+
+# (名称, 过滤条件)；评分在 [0, 5) 均匀分布，min_rating 对应的选择度为 1 - min_rating / 5
+FILTERS = [
+    ("rating 50%", {"min_rating": 2.5}),
+    ("rating 10%", {"min_rating": 4.5}),
+    ("city 1%", {"location": "C7市"}),
+    ("rating 1%", {"min_rating": 4.95}),
+    ("city+tag ~0.1%", {"location": "C7", "tags": ["标签03", "标签04"]}),
+    ("rating 0.1%", {"min_rating": 4.995}),
+]
+
+def synthetic_corpus(size: int, dimension: int, clusters: int, rng: np.random.Generator) -> np.ndarray:
+    """生成由 clusters 个高斯簇组成的归一化向量"""
+    centers = rng.standard_normal((clusters, dimension)).astype(np.float32)
+    labels = rng.integers(0, clusters, size)
+    vectors = centers[labels] + 0.5 * rng.standard_normal((size, dimension)).astype(np.float32)
+    faiss.normalize_L2(vectors)
+    return vectors
+
+def populate(vectors: np.ndarray, rng: np.random.Generator):
+    """重建数据表并写入带元数据的向量记录"""
+    Base.metadata.drop_all(bind=engine, tables=[VectorIndex.__table__])
+    Base.metadata.create_all(bind=engine, tables=[VectorIndex.__table__])
+    size = len(vectors)
+    cities = rng.integers(0, CITIES, size)
+    ratings = rng.uniform(0, 5, size)
+    for start in range(0, size, INSERT_CHUNK):
+        rows = []
+        for i in range(start, min(size, start + INSERT_CHUNK)):
+            tags = rng.choice(len(TAGS), 2, replace=False)
+            rows.append({
+                "collection_name": COLLECTION,
+                "record_id": i,
+                "vector": vectors[i],
+                "meta_info": {
+                    "name": f"spot-{i}",
+                    "location": f"C{cities[i]}市第{i % 20}区",
+                    "tags": [TAGS[t] for t in tags],
+                    "rating": round(float(ratings[i]), 3),
+                }
+            })
+        with Session() as session:
+            session.bulk_insert_mappings(VectorIndex, rows)
+
+def ground_truth(vectors: np.ndarray, queries: np.ndarray, ids: np.ndarray, k: int):
+    """在满足条件的记录中精确检索"""
+    _, positions = faiss.knn(queries, vectors[ids], min(k, len(ids)))
+    return [set(ids[row].tolist()) for row in positions]
+
+def post_filter(query: np.ndarray, k: int, ids: set):
+    """检索后过滤：不带条件取 top-k，再保留满足条件的记录"""
+    results = vector_store._search_vectors(COLLECTION, query[None, :], k)[0]
+    return [r for r in results if r["record_id"] in ids]
+
+def summarize(latencies) -> dict:
+    ordered = sorted(latencies)
+    return {
+        "p50_ms": round(statistics.median(ordered) * 1000, 3),
+        "p99_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000, 3),
+    }
+
+def run(fn, queries, truth, k: int) -> dict:
+    latencies, recalls, full = [], [], 0
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        results = fn(query)
+        latencies.append(time.perf_counter() - start)
+        found = {r["record_id"] for r in results}
+        recalls.append(len(found & expected) / max(len(expected), 1))
+        full += len(results) == len(expected)
+    return {
+        **summarize(latencies),
+        f"recall@{k}": round(statistics.mean(recalls), 4),
+        "full_k": round(full / len(queries), 3),
+    }
+
+def main(args):
+    rng = np.random.default_rng(args.seed)
+    dimension = vector_store.dimension
+    # 查询与语料来自同一分布，留出的部分不写入数据库
+    corpus = synthetic_corpus(args.size + args.queries, dimension, args.clusters, rng)
+    vectors, queries = corpus[:args.size], corpus[args.size:]
+    populate(vectors, rng)
+    report = []
+
+    for index_name, params in INDEX_CONFIGS:
+        vector_store.configs[COLLECTION] = IndexConfig(**params)
+        vector_store.rebuild_index(COLLECTION)
+        attributes = vector_store.attributes[COLLECTION]
+
+        for filter_name, condition in FILTERS:
+            ids = np.flatnonzero(attributes.match(condition))
+            id_set = set(ids.tolist())
+            truth = ground_truth(vectors, queries, ids, args.k)
+
+            result = {
+                "index": index_name,
+                "filter": filter_name,
+                "matched": len(ids),
+                "selectivity": round(len(ids) / args.size, 4),
+                "filtered": run(
+                    lambda q: vector_store._search_vectors(COLLECTION, q[None, :], args.k, filter=condition)[0],
+                    queries, truth, args.k
+                ),
+                "post_filter": run(lambda q: post_filter(q, args.k, id_set), queries, truth, args.k),
+            }
+            report.append(result)
+            print(json.dumps(result, ensure_ascii=False))
+
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="过滤检索基准测试")
+    parser.add_argument("--size", type=int, default=100000, help="记录数")
+    parser.add_argument("--queries", type=int, default=200, help="每种过滤条件的查询数")
+    parser.add_argument("--k", type=int, default=10, help="每次检索返回的记录数")
+    parser.add_argument("--clusters", type=int, default=200, help="合成语料的簇数")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    main(parser.parse_args())
@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+"""
+向量检索结果映射基准测试
+
+在临时 SQLite 数据库中写入指定数量的向量记录，分别测量：
+- 改造前：每次检索先 COUNT(*)，再加载集合全部 VectorIndex 记录，按位置映射结果
+- 改造后：通过内存中的位置映射表得到记录，不访问数据库
+
+只测量检索和结果映射（查询向量预先生成），不包含文本编码。
+
+用法：
+    python scripts/bench_vector_mapping.py --sizes 10000,100000,1000000 --queries 200
+"""
+import sys
+import os
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 使用临时数据库，需在导入 app 模块前设置
+_BENCH_DB = os.path.join(tempfile.mkdtemp(prefix="bench_vector_"), "bench.db")
+os.environ.setdefault("SQLALCHEMY_DATABASE_URI", f"sqlite:///{_BENCH_DB}")
+os.environ.setdefault("SQL_ECHO", "false")
+
+import argparse
+import json
+import statistics
+import time
+
+import numpy as np
+
+from app.db.base import Base
+from app.db.models import VectorIndex
+from app.db.session import Session, engine
+from app.services.vector_store import vector_store
+
+COLLECTION = "bench"
+INSERT_CHUNK = 10000
+
+def populate(size: int, dimension: int, rng: np.random.Generator):
+    """重建数据表并写入 size 条随机向量记录"""
+    Base.metadata.drop_all(bind=engine, tables=[VectorIndex.__table__])
+    Base.metadata.create_all(bind=engine, tables=[VectorIndex.__table__])
+    for start in range(0, size, INSERT_CHUNK):
+        count = min(INSERT_CHUNK, size - start)
+        vectors = rng.standard_normal((count, dimension)).astype(np.float32)
+        rows = [
+            {
+                "collection_name": COLLECTION,
+                "record_id": start + i,
+                "vector": vector,
+                "meta_info": {"name": f"spot-{start + i}"}
+            }
+            for i, vector in enumerate(vectors)
+        ]
+        with Session() as session:
+            session.bulk_insert_mappings(VectorIndex, rows)
+
+def legacy_search(query_vector: np.ndarray, k: int):
+    """改造前的检索流程：COUNT(*) + 加载全部记录后按位置映射"""
+    with Session() as session:
+        record_count = session.query(VectorIndex).filter(
+            VectorIndex.collection_name == COLLECTION
+        ).count()
+    D, I = vector_store.indices[COLLECTION].search(np.array([query_vector]), min(k, record_count))
+    results = []
+    with Session() as session:
+        vector_indices = session.query(VectorIndex).filter(
+            VectorIndex.collection_name == COLLECTION
+        ).all()
+        for distance, idx in zip(D[0], I[0]):
+            if 0 <= idx < len(vector_indices):
+                results.append({
+                    "record_id": vector_indices[idx].record_id,
+                    "distance": float(distance),
+                    "metadata": vector_indices[idx].meta_info
+                })
+    return results
+
+def measure(fn, queries) -> list:
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        fn(query)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+def summarize(latencies) -> dict:
+    ordered = sorted(latencies)
+    return {
+        "p50_ms": round(statistics.median(ordered) * 1000, 3),
+        "p99_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000, 3),
+    }
+
+def main(args):
+    rng = np.random.default_rng(args.seed)
+    dimension = vector_store.dimension
+    report = []
+    for size in [int(s) for s in args.sizes.split(",")]:
+        populate(size, dimension, rng)
+        vector_store.indices.pop(COLLECTION, None)
+
+        start = time.perf_counter()
+        vector_store.rebuild_index(COLLECTION)
+        rebuild_seconds = time.perf_counter() - start
+
+        queries = rng.standard_normal((args.queries, dimension)).astype(np.float32)
+        current = measure(lambda q: vector_store._search_vectors(COLLECTION, q[None, :], args.k), queries)
+        legacy = measure(lambda q: legacy_search(q, args.k), queries[:args.legacy_queries])
+
+        # 两种映射方式的结果应一致
+        assert legacy_search(queries[0], args.k) == vector_store._search_vectors(COLLECTION, queries[:1], args.k)[0]
+
+        result = {
+            "records": size,
+            "rebuild_s": round(rebuild_seconds, 2),
+            "position_table": summarize(current),
+            "legacy_scan": summarize(legacy),
+        }
+        result["speedup_p50"] = round(result["legacy_scan"]["p50_ms"] / max(result["position_table"]["p50_ms"], 1e-6), 1)
+        report.append(result)
+        print(json.dumps(result, ensure_ascii=False))
+
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="向量检索结果映射基准测试")
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="记录数，逗号分隔")
+    parser.add_argument("--queries", type=int, default=200, help="每个规模下使用位置映射表的检索次数")
+    parser.add_argument("--legacy-queries", type=int, default=5, help="每个规模下改造前流程的检索次数（耗时较长）")
+    parser.add_argument("--k", type=int, default=5, help="每次检索返回的记录数")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    main(parser.parse_args())
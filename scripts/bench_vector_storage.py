@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+"""
+向量存储格式基准测试
+
+在两个临时 SQLite 数据库中写入相同的随机向量记录，分别比较：
+- 改造前：vector 列为 JSON 数组，重建索引时逐行解析 JSON
+- 改造后：vector 列为 float32 字节，重建索引时用 np.frombuffer 直接映射
+
+报告每种格式的数据库文件大小（VACUUM 后）和从数据库重建 FAISS 索引的耗时。
+
+用法：
+    python scripts/bench_vector_storage.py --sizes 10000,100000 --repeat 3
+"""
+import sys
+import os
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 使用临时数据库并关闭快照，需在导入 app 模块前设置
+_BENCH_DIR = tempfile.mkdtemp(prefix="bench_storage_")
+_BENCH_DB = os.path.join(_BENCH_DIR, "blob.db")
+os.environ.setdefault("SQLALCHEMY_DATABASE_URI", f"sqlite:///{_BENCH_DB}")
+os.environ.setdefault("SQL_ECHO", "false")
+os.environ["VECTOR_INDEX_DIR"] = ""
+
+import argparse
+import json
+import statistics
+import time
+
+import faiss
+import numpy as np
+from sqlalchemy import Column, Integer, MetaData, String, Table, create_engine, select, text
+from sqlalchemy.dialects.sqlite import JSON
+
+from app.db.base import Base
+from app.db.models import VectorIndex
+from app.db.session import Session, engine
+from app.services.index_factory import live_vectors
+from app.services.vector_store import vector_store
+
+COLLECTION = "bench"
+INSERT_CHUNK = 10000
+
+# 改造前的表结构：vector 列为 JSON
+_legacy_metadata = MetaData()
+legacy_table = Table(
+    "vector_indices", _legacy_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("collection_name", String),
+    Column("record_id", Integer),
+    Column("vector", JSON),
+    Column("meta_info", JSON),
+)
+legacy_engine = create_engine(f"sqlite:///{os.path.join(_BENCH_DIR, 'json.db')}")
+
+def populate(size: int, dimension: int, rng: np.random.Generator):
+    """重建两个数据库的数据表，写入相同的 size 条随机向量记录"""
+    _legacy_metadata.drop_all(legacy_engine)
+    _legacy_metadata.create_all(legacy_engine)
+    Base.metadata.drop_all(bind=engine, tables=[VectorIndex.__table__])
+    Base.metadata.create_all(bind=engine, tables=[VectorIndex.__table__])
+
+    for start in range(0, size, INSERT_CHUNK):
+        count = min(INSERT_CHUNK, size - start)
+        vectors = rng.standard_normal((count, dimension)).astype(np.float32)
+        rows = [
+            {
+                "collection_name": COLLECTION,
+                "record_id": start + i,
+                "vector": vector,
+                "meta_info": {"name": f"spot-{start + i}"}
+            }
+            for i, vector in enumerate(vectors)
+        ]
+        with Session() as session:
+            session.bulk_insert_mappings(VectorIndex, rows)
+        with legacy_engine.begin() as conn:
+            conn.execute(legacy_table.insert(), [dict(row, vector=row["vector"].tolist()) for row in rows])
+
+    for bind in (engine, legacy_engine):
+        with bind.connect() as conn:
+            conn.execute(text("VACUUM"))
+
+def legacy_rebuild(dimension: int) -> faiss.Index:
+    """改造前的重建流程：读取 JSON 向量后转换为矩阵"""
+    with legacy_engine.connect() as conn:
+        rows = conn.execute(
+            select(legacy_table.c.record_id, legacy_table.c.vector, legacy_table.c.meta_info)
+            .where(legacy_table.c.collection_name == COLLECTION)
+            .order_by(legacy_table.c.id)
+        ).all()
+    index = faiss.IndexFlatL2(dimension)
+    index.add(np.asarray([row.vector for row in rows], dtype=np.float32))
+    return index
+
+def measure(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return round(statistics.median(timings), 3)
+
+def file_size_mb(path: str) -> float:
+    return round(os.path.getsize(path) / 1024 / 1024, 1)
+
+def main(args):
+    rng = np.random.default_rng(args.seed)
+    dimension = vector_store.dimension
+    report = []
+    for size in [int(s) for s in args.sizes.split(",")]:
+        populate(size, dimension, rng)
+
+        # 两种格式重建出的索引应完全一致
+        legacy_index = legacy_rebuild(dimension)
+        vector_store.rebuild_index(COLLECTION)
+        assert np.array_equal(
+            legacy_index.reconstruct_n(0, legacy_index.ntotal),
+            live_vectors(vector_store.indices[COLLECTION])[0]
+        )
+
+        result = {
+            "records": size,
+            "json": {
+                "db_mb": file_size_mb(legacy_engine.url.database),
+                "rebuild_s": measure(lambda: legacy_rebuild(dimension), args.repeat),
+            },
+            "blob": {
+                "db_mb": file_size_mb(_BENCH_DB),
+                "rebuild_s": measure(lambda: vector_store.rebuild_index(COLLECTION), args.repeat),
+            },
+        }
+        result["size_ratio"] = round(result["json"]["db_mb"] / max(result["blob"]["db_mb"], 1e-6), 2)
+        result["rebuild_speedup"] = round(result["json"]["rebuild_s"] / max(result["blob"]["rebuild_s"], 1e-6), 1)
+        report.append(result)
+        print(json.dumps(result, ensure_ascii=False))
+
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="向量存储格式基准测试")
+    parser.add_argument("--sizes", default="10000,100000", help="记录数，逗号分隔")
+    parser.add_argument("--repeat", type=int, default=3, help="每种格式重建索引的次数，取中位数")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    main(parser.parse_args())
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+"""
+本地意图路由离线评估
+
+对一组标注好的用户输入运行本地意图路由，统计：
+- 覆盖率：本地路由直接命中（未回退大模型）的比例
+- 命中准确率：本地路由命中时工具选择正确的比例
+- 路由延迟，以及相对大模型意图识别节省的延迟
+
+用法：
+    python scripts/eval_intent_router.py --threshold 0.8 --margin 0.05
+    python scripts/eval_intent_router.py --llm   # 实际调用大模型测量意图识别延迟
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from app.services.intent_router import IntentRouter
+
+# 评估集（与 INTENT_EXAMPLES 中的示例不重复）
+LABELLED_QUERIES = [
+    ("兵马俑的门票价格是多少", "search_spot_info"),
+    ("大雁塔晚上开放吗", "search_spot_info"),
+    ("故宫和天坛的开放时间", "search_spot_info"),
+    ("长城门票贵不贵", "search_spot_info"),
+    ("颐和园怎么坐公交过去", "search_spot_info"),
+    ("春天适合去哪些景点", "spot_recommend"),
+    ("五天假期推荐去哪玩", "spot_recommend"),
+    ("喜欢历史，推荐几个景点", "spot_recommend"),
+    ("冬天有什么景点值得去", "spot_recommend"),
+    ("10月份去哪里旅游好", "spot_recommend"),
+    ("故宫一天怎么逛", "spot_route_recommend"),
+    ("自驾去长城的路线怎么安排", "spot_route_recommend"),
+    ("兵马俑半天的游览路线", "spot_route_recommend"),
+    ("帮我安排颐和园的参观顺序", "spot_route_recommend"),
+    ("想体验地道的美食文化", "deep_search"),
+    ("有什么特色的民俗活动", "deep_search"),
+    ("想玩点小众有深度的", "deep_search"),
+    ("一定要把长城加进去", "add_required_spot"),
+    ("天坛加入必选景点", "add_required_spot"),
+    ("行程里必须有回民街", "add_required_spot"),
+    ("去北京旅游有什么注意事项", "travel_tips"),
+    ("西安的天气怎么样，穿什么", "travel_tips"),
+    ("去西安玩需要注意哪些习俗", "travel_tips"),
+    ("谢谢你的建议", "general_tool"),
+    ("好的明白了", "general_tool"),
+    ("早上好", "general_tool"),
+]
+
+async def measure_llm_latency(queries):
+    """实际调用大模型意图识别，返回各次耗时（秒）"""
+    from app.api.api_v1.api import recognize_intent
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        await recognize_intent(query, f"当前用户需求：{query}")
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+def main(args):
+    router = IntentRouter(threshold=args.threshold, margin=args.margin)
+    router.route("预热")
+
+    routed = correct = 0
+    latencies = []
+    confusions = []
+    for query, expected in LABELLED_QUERIES:
+        start = time.perf_counter()
+        plan = router.route(query)
+        latencies.append(time.perf_counter() - start)
+        if plan is None:
+            continue
+        routed += 1
+        predicted = plan["functions"][0]["funcName"]
+        if predicted == expected:
+            correct += 1
+        else:
+            confusions.append((query, expected, predicted))
+
+    if args.llm:
+        llm_latencies = asyncio.run(measure_llm_latency([q for q, _ in LABELLED_QUERIES[:args.llm_samples]]))
+        llm_latency = statistics.mean(llm_latencies)
+    else:
+        llm_latency = args.llm_latency
+
+    total = len(LABELLED_QUERIES)
+    router_latency = statistics.mean(latencies)
+    coverage = routed / total
+    saved = coverage * llm_latency - router_latency
+    report = {
+        "samples": total,
+        "routed": routed,
+        "coverage": round(coverage, 3),
+        "routed_accuracy": round(correct / routed, 3) if routed else None,
+        "router_latency_ms": round(router_latency * 1000, 2),
+        "llm_intent_latency_ms": round(llm_latency * 1000, 2),
+        "avg_latency_saved_ms": round(saved * 1000, 2),
+        "confusions": confusions,
+    }
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="本地意图路由离线评估")
+    parser.add_argument("--threshold", type=float, default=0.8, help="最高相似度阈值")
+    parser.add_argument("--margin", type=float, default=0.05, help="与次佳工具的最小相似度差距")
+    parser.add_argument("--llm", action="store_true", help="实际调用大模型测量意图识别延迟")
+    parser.add_argument("--llm-samples", type=int, default=5, help="测量大模型延迟的样本数")
+    parser.add_argument("--llm-latency", type=float, default=2.0, help="未测量时假定的大模型意图识别延迟（秒）")
+    main(parser.parse_args())